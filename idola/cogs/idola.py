@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import calendar
+import io
 import os
 import traceback
 
@@ -7,24 +9,56 @@ from discord.ext import commands, tasks
 
 from datetime import datetime
 
-from lib.api import IdolaAPI
+from lib.api import IdolaAPI, unpack
+from lib.async_api import AsyncIdolaAPI
+from lib.borders import BORDER_RANKS, BorderPoller
+from lib.crawler import LeaderboardCrawler
+from lib.forecast import BorderForecaster
+from lib.history import BorderHistory
+from lib.locator import RankLocator
+from lib.metrics import LOOP_SECONDS, METRICS_PORT, start_server, watch_discord_rate_limits
+from lib.pace import PaceIndex
+from lib.perf import MAX_CAPTURE_SECONDS, perf_tracker
+from lib.pinned import PinnedMessageManager
+from lib.renamer import ChannelRenamer
+from lib.resilience import deadline_after
+from lib.scheduler import BACKGROUND
 
 
 IDOLA_USER_AGENT = os.getenv("IDOLA_USER_AGENT")
 IDOLA_APP_VER = os.getenv("IDOLA_APP_VER")
-IDOLA_DEVICE_ID = os.getenv("IDOLA_DEVICE_ID")
-IDOLA_DEVICE_TOKEN = os.getenv("IDOLA_DEVICE_TOKEN")
-IDOLA_TOKEN_KEY = os.getenv("IDOLA_TOKEN_KEY")
-IDOLA_UUID = os.getenv("IDOLA_UUID")
+IDOLA_POOL_SIZE = int(os.getenv("IDOLA_POOL_SIZE") or 4)
+# Seconds a command or a border poll may spend on the game API before it is abandoned
+COMMAND_DEADLINE = 30
+POLL_DEADLINE = 50
+# Local port for the Prometheus scrape endpoint, 0 turns it off
+IDOLA_METRICS_PORT = int(os.getenv("IDOLA_METRICS_PORT") or METRICS_PORT)
+
+
+def load_accounts():
+    # The first account uses the plain IDOLA_* settings, extra accounts add a _2, _3, ... suffix
+    accounts = []
+    suffix = ""
+    while os.getenv("IDOLA_DEVICE_ID" + suffix):
+        accounts.append(
+            IdolaAPI(
+                IDOLA_USER_AGENT,
+                IDOLA_APP_VER,
+                os.getenv("IDOLA_DEVICE_ID" + suffix),
+                os.getenv("IDOLA_DEVICE_TOKEN" + suffix),
+                os.getenv("IDOLA_TOKEN_KEY" + suffix),
+                os.getenv("IDOLA_UUID" + suffix),
+                IDOLA_POOL_SIZE,
+                login=False,
+            )
+        )
+        suffix = f"_{len(accounts) + 1}"
+    if not accounts:
+        raise Exception("At least one Idola account must be defined")
+    return accounts
+
 
-idola = IdolaAPI(
-    IDOLA_USER_AGENT,
-    IDOLA_APP_VER,
-    IDOLA_DEVICE_ID,
-    IDOLA_DEVICE_TOKEN,
-    IDOLA_TOKEN_KEY,
-    IDOLA_UUID,
-)
+idola = AsyncIdolaAPI(load_accounts())
 
 
 class IDOLA(commands.Cog):
@@ -44,6 +78,27 @@ class IDOLA(commands.Cog):
         
         self.border_message_channel = os.getenv("BORDER_MESSAGE_CHANNEL")
 
+        self.border_channels = [
+            (self.arena_border_100_channel, "arena", 100, "🥇100"),
+            (self.arena_border_500_channel, "arena", 500, "🥈500"),
+            (self.arena_border_1000_channel, "arena", 1000, "🥉1K"),
+            (self.suppression_border_100_channel, "suppression", 100, "🥇100"),
+            (self.suppression_border_1000_channel, "suppression", 1000, "🥈1K"),
+            (self.suppression_border_5000_channel, "suppression", 5000, "🥉5K"),
+            (self.creation_border_100_channel, "creation", 100, "🥇100"),
+            (self.creation_border_1000_channel, "creation", 1000, "🥈1K"),
+            (self.creation_border_5000_channel, "creation", 5000, "🥉5K"),
+        ]
+        self.border_poller = BorderPoller(idola)
+        self.channel_renamer = ChannelRenamer()
+        self.pinned_messages = PinnedMessageManager(client)
+        self.rank_locator = RankLocator(idola)
+        self.border_history = BorderHistory()
+        self.border_forecaster = BorderForecaster(self.border_history)
+        self.border_pace_index = PaceIndex(self.border_history)
+        # (kind, event_id) -> running crawl task, the loop itself only keeps weak references to tasks
+        self.crawls = {}
+
     @commands.Cog.listener()
     async def on_ready(self):
         await self.client.change_presence(activity=discord.Game("Ready!"))
@@ -52,10 +107,18 @@ class IDOLA(commands.Cog):
 
         # Start looping tasks
         self.relog.start()
+        self.border_snapshot_update.start()
         self.border_status_update.start()
         self.border_channel_update.start()
         self.border_pinned_update.start()
 
+    async def cog_before_invoke(self, ctx):
+        ctx.perf_token = perf_tracker.begin()
+
+    async def cog_after_invoke(self, ctx):
+        if getattr(ctx, "perf_token", None):
+            perf_tracker.end(ctx.command.qualified_name, ctx.perf_token)
+
     @commands.Cog.listener()
     async def on_command_error(self, ctx, error):
         traceback.print_exception(type(error), error, error.__traceback__)
@@ -65,7 +128,7 @@ class IDOLA(commands.Cog):
     @commands.is_owner()
     async def restart(self, ctx):
         try:
-            idola.start()
+            await idola.broadcast("start")
             await ctx.send("IdolaBot has been restarted")
         except Exception as e:
             print(e, traceback.format_exc())
@@ -75,173 +138,136 @@ class IDOLA(commands.Cog):
     @commands.is_owner()
     async def save_profiles(self, ctx):
         try:
-            idola.save_profile_cache()
+            await idola.call("save_profile_cache")
             await ctx.send("Profile cache saved")
         except Exception as e:
             print(traceback.format_exc())
             await ctx.send(f"Error: Could not save profile cache - {e}")
 
-    @tasks.loop(seconds=60)
-    async def border_status_update(self):
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def perf(self, ctx, mode="report", seconds: int = 30):
+        if mode == "report":
+            await ctx.send(f"```\n{perf_tracker.report()}\n```")
+            return
+        if mode not in ("cpu", "memory") or not 0 < seconds <= MAX_CAPTURE_SECONDS:
+            await ctx.send(f"Usage: perf [report|cpu|memory] [seconds, up to {MAX_CAPTURE_SECONDS}]")
+            return
         try:
-            border_score = idola.get_top_100_raid_suppression_border()
-            print(f"{border_score:,d} - SuppressionBorderTop100")
-            await self.client.change_presence(activity=discord.Game(f"{border_score:,d} - SuppressionBorderTop100"))
+            await ctx.send(f"Capturing {mode} for {seconds}s")
+            if mode == "cpu":
+                summary = await perf_tracker.profile_cpu(seconds)
+            else:
+                summary = await perf_tracker.profile_memory(seconds)
+            await ctx.send(file=discord.File(io.BytesIO(summary.encode("utf-8")), filename=f"perf_{mode}.txt"))
         except Exception as e:
-            print(e, traceback.format_exc())
+            print(traceback.format_exc())
+            await ctx.send(f"Error: Could not capture {mode} - {e}")
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def crawl(self, ctx, kind, max_rank: int = 10000, output_format="ndjson"):
+        if kind not in BORDER_RANKS or output_format not in ("ndjson", "csv"):
+            await ctx.send(f"Usage: crawl <{'|'.join(BORDER_RANKS)}> [max_rank] [ndjson|csv]")
+            return
+        event_id = await idola.call("get_latest_arena_event_id" if kind == "arena" else "get_latest_raid_event_id")
+        if (kind, event_id) in self.crawls:
+            await ctx.send(f"A {kind} crawl is already running for this event")
+            return
+        crawler = LeaderboardCrawler(idola, kind, event_id, max_rank, output_format)
+        await ctx.send(f"Crawling {kind} up to rank {max_rank:,d} into {crawler.output_path}")
+        task = self.client.loop.create_task(self.run_crawl(ctx, crawler))
+        self.crawls[(kind, event_id)] = task
+        task.add_done_callback(lambda _: self.crawls.pop((kind, event_id), None))
+
+    async def run_crawl(self, ctx, crawler):
+        try:
+            checkpoint = await crawler.crawl()
+            await ctx.send(f"Crawl finished with {checkpoint['entries']:,d} players in {crawler.output_path}")
+        except Exception as e:
+            print(traceback.format_exc())
+            await ctx.send(f"Crawl stopped, run it again to resume from the last checkpoint - {e}")
+
+    @tasks.loop(seconds=60)
+    async def border_snapshot_update(self):
+        with LOOP_SECONDS.time(loop="border_snapshot_update"), perf_tracker.track("loop:border_snapshot_update"):
+            try:
+                snapshot = await self.border_poller.poll(deadline_after(POLL_DEADLINE))
+                await self.client.loop.run_in_executor(None, self.record_snapshot, snapshot)
+            except Exception as e:
+                print(e, traceback.format_exc())
+
+    @tasks.loop(seconds=60)
+    async def border_status_update(self):
+        with LOOP_SECONDS.time(loop="border_status_update"), perf_tracker.track("loop:border_status_update"):
+            try:
+                snapshot = await self.border_poller.latest()
+                border_score = snapshot.get("suppression", 100)
+                print(f"{border_score:,d} - SuppressionBorderTop100")
+                await self.client.change_presence(activity=discord.Game(f"{border_score:,d} - SuppressionBorderTop100"))
+            except Exception as e:
+                print(e, traceback.format_exc())
 
     @tasks.loop(hours=4)
     async def relog(self):
         print("Relogging")
-        idola.start()
+        await idola.broadcast("start", priority=BACKGROUND)
 
     @tasks.loop(seconds=180)
     async def border_pinned_update(self):
-        try:
-            if not self.border_message_channel: return
-            
-            channel = self.client.get_channel(int(self.border_message_channel))
-            print(f"Updating pinned message in {channel.name}")
-            pinned_messages = await channel.pins()
-            border_message = None
-            for pinned_message in pinned_messages:
-                if pinned_message.author.id == self.client.user.id:
-                    border_message = pinned_message
-                    print(f"Updating existing pinned message with ID {border_message.id}")
-                    break
-                    
-            embed = discord.Embed(title="Idola Borders", color=discord.Colour.blue())
+        with LOOP_SECONDS.time(loop="border_pinned_update"), perf_tracker.track("loop:border_pinned_update"):
+            try:
+                if not self.border_message_channel: return
             
-            #Arena
-            border_score_point_100 = idola.get_top_100_arena_border()
-            border_score_point_500 = idola.get_top_500_arena_border()
-            border_score_point_1000 = idola.get_top_1000_arena_border()
+                channel = self.client.get_channel(int(self.border_message_channel))
+                snapshot = await self.border_poller.latest()
+                embed = discord.Embed(title="Idola Borders", color=discord.Colour.blue())
+                embed.add_field(name="Idola Arena Border", value=self.border_lines(snapshot, "arena"), inline=False)
+                embed.add_field(name="Idola Raid Suppression Border", value=self.border_lines(snapshot, "suppression"), inline=False)
+                embed.add_field(name="Idola Creation Border", value=self.border_lines(snapshot, "creation"), inline=False)
+                # Discord renders the countdown itself, so the embed only changes when a border does
+                end_date = snapshot.end_date
+                embed.add_field(name="Time Left", value=f"<t:{calendar.timegm(end_date.timetuple())}:R>", inline=False)
+                embed.add_field(name="Ending at", value=IdolaAPI.datetime_jp_format(end_date), inline=True)
             
-            border_output=f"🥇100: {border_score_point_100:,d} points\n" if border_score_point_100 else "🥇100: Unknown\n"
-            border_output+=f"🥇500: {border_score_point_500:,d} points\n" if border_score_point_500 else "🥇500: Unknown\n"
-            border_output+=f"🥇1000: {border_score_point_1000:,d} points\n" if border_score_point_1000 else "🥇1000: Unknown\n"
-            embed.add_field(name="Idola Arena Border", value=border_output, inline=False)
-                
-            #Suppression
-            border_score_point_100 = idola.get_top_100_raid_suppression_border()
-            border_score_point_500 = idola.get_top_500_raid_suppression_border()
-            border_score_point_1000 = idola.get_top_1000_raid_suppression_border()
-            border_score_point_5000 = idola.get_top_5000_raid_suppression_border()
-            
-            border_output=f"🥇100: {border_score_point_100:,d} points\n" if border_score_point_100 else "🥇100: Unknown\n"
-            border_output+=f"🥇500: {border_score_point_500:,d} points\n" if border_score_point_500 else "🥇500: Unknown\n"
-            border_output+=f"🥇1000: {border_score_point_1000:,d} points\n" if border_score_point_1000 else "🥇1000: Unknown\n"
-            border_output+=f"🥇5000: {border_score_point_5000:,d} points\n" if border_score_point_5000 else "🥇5000: Unknown\n"
-            embed.add_field(name="Idola Raid Suppression Border", value=border_output, inline=False)
-        
-            #Creation
-            border_score_point_100 = idola.get_top_100_raid_creation_border()
-            border_score_point_500 = idola.get_top_500_raid_creation_border()
-            border_score_point_1000 = idola.get_top_1000_raid_creation_border()
-            border_score_point_5000 = idola.get_top_5000_raid_creation_border()
-
-            border_output=f"🥇100: {border_score_point_100:,d} points\n" if border_score_point_100 else "🥇100: Unknown\n"
-            border_output+=f"🥇500: {border_score_point_500:,d} points\n" if border_score_point_500 else "🥇500: Unknown\n"
-            border_output+=f"🥇1000: {border_score_point_1000:,d} points\n" if border_score_point_1000 else "🥇1000: Unknown\n"
-            border_output+=f"🥇5000: {border_score_point_5000:,d} points\n" if border_score_point_5000 else "🥇5000: Unknown\n"
-            embed.add_field(name="Idola Creation Border", value=border_output, inline=False)
-        
-            #Time
-            current_time = idola.get_current_time()
-            end_date = idola.get_raid_event_end_date()
-            time_left = idola.datetime_difference(current_time, end_date)
-
-            embed.add_field(name="Time Left", value=time_left, inline=False )
-            embed.add_field(name="Current Time", value=idola.datetime_jp_format(current_time), inline=True)
-            embed.add_field(name="Ending at", value=idola.datetime_jp_format(end_date), inline=True)
-            
-            if not border_message == None:
-                await border_message.edit(embed=embed)
-            else:
-                border_message = await channel.send(embed=embed)
-                await border_message.pin()
-        except Exception as e:
-            print(traceback.format_exc())
+                if await self.pinned_messages.update(channel, embed):
+                    print(f"Updated pinned message in {channel.name}")
+            except Exception as e:
+                print(traceback.format_exc())
         
-    @tasks.loop(seconds=120)
+    @tasks.loop(seconds=60)
     async def border_channel_update(self):
-        print("Updating channel borders")
-        try:
-            # Arena
-            if self.arena_border_100_channel:
-                arena_border_score_100 = idola.get_top_100_arena_border()
-                channel = self.client.get_channel(int(self.arena_border_100_channel))
-                await channel.edit(name=f"🥇100: {arena_border_score_100:,d}" if arena_border_score_100 else f"🥇100: Unknown")
-            if self.arena_border_500_channel:
-                arena_border_score_500 = idola.get_top_500_arena_border()
-                channel = self.client.get_channel(int(self.arena_border_500_channel))
-                await channel.edit(name=f"🥈500: {arena_border_score_500:,d}" if arena_border_score_500 else f"🥈500: Unknown")
-            if self.arena_border_1000_channel:
-                arena_border_score_1000 = idola.get_top_1000_arena_border()
-                channel = self.client.get_channel(int(self.arena_border_1000_channel))
-                await channel.edit(name=f"🥉1K: {arena_border_score_1000:,d}" if arena_border_score_1000 else f"🥉1K: Unknown")
-            # Suppression
-            if self.suppression_border_100_channel:
-                raid_suppression_border_100 = idola.get_top_100_raid_suppression_border()
-                channel = self.client.get_channel(int(self.suppression_border_100_channel))
-                await channel.edit(name=f"🥇100: {raid_suppression_border_100:,d}" if raid_suppression_border_100 else f"🥇100: Unknown")
-            if self.suppression_border_1000_channel:
-                raid_suppression_border_1000 = idola.get_top_1000_raid_suppression_border()
-                channel = self.client.get_channel(int(self.suppression_border_1000_channel))
-                await channel.edit(name=f"🥈1K: {raid_suppression_border_1000:,d}" if raid_suppression_border_1000 else f"🥈1K: Unknown")
-            if self.suppression_border_5000_channel:
-                raid_suppression_border_5000 = idola.get_top_5000_raid_suppression_border()
-                channel = self.client.get_channel(int(self.suppression_border_5000_channel))
-                await channel.edit(name=f"🥉5K: {raid_suppression_border_5000:,d}" if raid_suppression_border_5000 else f"🥉5K: Unknown")
-            # Creation
-            if self.creation_border_100_channel:
-                raid_creation_border_100 = idola.get_top_100_raid_creation_border()
-                channel = self.client.get_channel(int(self.creation_border_100_channel))
-                await channel.edit(name=f"🥇100: {raid_creation_border_100:,d}" if raid_creation_border_100 else f"🥇100: Unknown")
-            if self.creation_border_1000_channel:
-                raid_creation_border_1000 = idola.get_top_1000_raid_creation_border()
-                channel = self.client.get_channel(int(self.creation_border_1000_channel))
-                await channel.edit(name=f"🥈1K: {raid_creation_border_1000:,d}" if raid_creation_border_1000 else f"🥈1K: Unknown")
-            if self.creation_border_5000_channel:
-                raid_creation_border_5000 = idola.get_top_5000_raid_creation_border()
-                channel = self.client.get_channel(int(self.creation_border_5000_channel))
-                await channel.edit(name=f"🥉5K: {raid_creation_border_5000:,d}" if raid_creation_border_5000 else f"🥉5K: Unknown")
-        except Exception as e:
-            print(traceback.format_exc())
-
-    @commands.command()
-    async def arena_border(self, ctx):
-        """Shows the Top 100 border for arena"""
-        border_score_point_100 = idola.get_top_100_arena_border()
-        border_score_point_500 = idola.get_top_500_arena_border()
-        border_score_point_1000 = idola.get_top_1000_arena_border()
-
-        current_time = idola.get_current_time()
-        end_date = idola.get_raid_event_end_date()
-        time_left = idola.datetime_difference(current_time, end_date)
+        with LOOP_SECONDS.time(loop="border_channel_update"), perf_tracker.track("loop:border_channel_update"):
+            print("Updating channel borders")
+            try:
+                snapshot = await self.border_poller.latest()
+                for channel_id, kind, rank, label in self.border_channels:
+                    if not channel_id:
+                        continue
+                    border_score = snapshot.get(kind, rank)
+                    channel = self.client.get_channel(int(channel_id))
+                    self.channel_renamer.request(channel, f"{label}: {border_score:,d}" if border_score else f"{label}: Unknown")
+                await self.channel_renamer.flush()
+            except Exception as e:
+                print(traceback.format_exc())
+
+    def record_snapshot(self, snapshot):
+        self.border_history.record(snapshot)
+        self.border_forecaster.observe(snapshot)
+
+    @staticmethod
+    def border_lines(snapshot, kind):
+        border_output = ""
+        for rank, border_score in snapshot.ranks(kind):
+            border_output += f"🥇{rank}: {border_score:,d} points\n" if border_score else f"🥇{rank}: Unknown\n"
+        return border_output
+
+    @staticmethod
+    def add_time_fields(embed, snapshot):
+        current_time = IdolaAPI.get_current_time()
+        end_date = snapshot.end_date
+        time_left = IdolaAPI.datetime_difference(current_time, end_date)
 
-        embed = discord.Embed(
-            title="Idola Arena Border",
-            color=discord.Colour.blue(),
-        )
-        embed.set_thumbnail(
-            url="https://raw.githubusercontent.com/iXyk/IdolaBot/master/idola/lib/assets/arena.png"
-        )
-        embed.add_field(
-            name="Top 100",
-            value=f"{border_score_point_100:,d} points" if border_score_point_100 else "Unknown",
-            inline=True,
-        )
-        embed.add_field(
-            name="Top 500",
-            value=f"{border_score_point_500:,d} points" if border_score_point_500 else "Unknown",
-            inline=True,
-        )
-        embed.add_field(
-            name="Top 1000",
-            value=f"{border_score_point_1000:,d} points" if border_score_point_1000 else "Unknown",
-            inline=True,
-        )
         embed.add_field(
             name="Time Left",
             value=time_left,
@@ -249,130 +275,173 @@ class IDOLA(commands.Cog):
         )
         embed.add_field(
             name="Current Time",
-            value=idola.datetime_jp_format(current_time),
+            value=IdolaAPI.datetime_jp_format(current_time),
             inline=True,
         )
         embed.add_field(
             name="Ending at",
-            value=idola.datetime_jp_format(end_date),
+            value=IdolaAPI.datetime_jp_format(end_date),
             inline=True,
         )
+
+    async def send_border_embed(self, ctx, title, thumbnail, kind):
+        snapshot = await self.border_poller.latest()
+        embed = discord.Embed(
+            title=title,
+            color=discord.Colour.blue(),
+        )
+        embed.set_thumbnail(url=thumbnail)
+        forecasts = await self.client.loop.run_in_executor(None, self.border_forecaster.forecast_snapshot, snapshot)
+        for rank, border_score in snapshot.ranks(kind):
+            value = f"{border_score:,d} points" if border_score else "Unknown"
+            forecast = forecasts.get((kind, rank))
+            if forecast:
+                value += f"\nForecast: ~{forecast:,d}"
+            embed.add_field(
+                name=f"Top {rank}",
+                value=value,
+                inline=True,
+            )
+        self.add_time_fields(embed, snapshot)
         await ctx.send(embed=embed)
 
+    @commands.command()
+    async def border_forecast(self, ctx):
+        """Shows where the borders are projected to land when the event ends"""
+        snapshot = await self.border_poller.latest()
+        forecasts = await self.client.loop.run_in_executor(None, self.border_forecaster.forecast_snapshot, snapshot)
+        embed = discord.Embed(title="Idola Border Forecast", color=discord.Colour.blue())
+        for kind in BORDER_RANKS:
+            border_output = ""
+            for rank, border_score in snapshot.ranks(kind):
+                forecast = forecasts.get((kind, rank))
+                current = f"{border_score:,d}" if border_score else "Unknown"
+                border_output += f"🥇{rank}: {current} → ~{forecast:,d}\n" if forecast else f"🥇{rank}: {current} → Unknown\n"
+            embed.add_field(name=f"Idola {kind.capitalize()} Border", value=border_output, inline=False)
+        self.add_time_fields(embed, snapshot)
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    async def arena_border(self, ctx):
+        """Shows the Top 100 border for arena"""
+        await self.send_border_embed(
+            ctx,
+            "Idola Arena Border",
+            "https://raw.githubusercontent.com/iXyk/IdolaBot/master/idola/lib/assets/arena.png",
+            "arena",
+        )
+
     @commands.command()
     async def suppression_border(self, ctx):
         """Shows the border for Idola Raid Suppression"""
-        border_score_point_100 = idola.get_top_100_raid_suppression_border()
-        border_score_point_500 = idola.get_top_500_raid_suppression_border()
-        border_score_point_1000 = idola.get_top_1000_raid_suppression_border()
-        border_score_point_5000 = idola.get_top_5000_raid_suppression_border()
+        await self.send_border_embed(
+            ctx,
+            "Idola Raid Suppression Border",
+            "https://raw.githubusercontent.com/iXyk/IdolaBot/master/idola/lib/assets/raid.png",
+            "suppression",
+        )
 
-        current_time = idola.get_current_time()
-        end_date = idola.get_raid_event_end_date()
-        time_left = idola.datetime_difference(current_time, end_date)
+    @commands.command()
+    async def creation_border(self, ctx):
+        """Shows the border for Idola Raid Creation"""
+        await self.send_border_embed(
+            ctx,
+            "Idola Raid Creation Border",
+            "https://raw.githubusercontent.com/iXyk/IdolaBot/master/idola/lib/assets/raid.png",
+            "creation",
+        )
 
+    @commands.command()
+    async def border_history(self, ctx, kind, rank: int, hours: int = 24):
+        """Shows how a border has moved over the last few hours, e.g. border_history suppression 100"""
+        if rank not in BORDER_RANKS.get(kind, ()):
+            await ctx.send(f"Borders are recorded for: {', '.join(f'{k} {unpack(r)}' for k, r in BORDER_RANKS.items())}")
+            return
+        snapshot = await self.border_poller.latest()
+        end = calendar.timegm(snapshot.fetched_at.timetuple())
+        records = await self.client.loop.run_in_executor(
+            None, self.border_history.read, snapshot.event_ids[kind], kind, rank, end - hours * 3600, end
+        )
+        if not records:
+            await ctx.send("No border history has been recorded for this event yet")
+            return
+        # Keep the message readable by sampling evenly across the range
+        step = max(1, len(records) // 24)
+        sampled = records[::step]
+        if sampled[-1] != records[-1]:
+            sampled.append(records[-1])
+        msg = []
+        for timestamp, score in sampled:
+            msg.append(f"{IdolaAPI.datetime_jp_format(IdolaAPI.epoch_to_datetime(timestamp))}: {score:,d}")
+        text = "\n".join(msg)
         embed = discord.Embed(
-            title="Idola Raid Suppression Border",
+            title=f"Idola {kind.capitalize()} Top {rank} Border History",
+            description=f"```{text}```",
             color=discord.Colour.blue(),
         )
-        embed.set_thumbnail(
-            url="https://raw.githubusercontent.com/iXyk/IdolaBot/master/idola/lib/assets/raid.png"
-        )
-        embed.add_field(
-            name="Top 100",
-            value=f"{border_score_point_100:,d} points" if border_score_point_100 else "Unknown",
-            inline=True,
-        )
-        embed.add_field(
-            name="Top 500",
-            value=f"{border_score_point_500:,d} points" if border_score_point_500 else "Unknown",
-            inline=True,
-        )
-        embed.add_field(
-            name="Top 1000",
-            value=f"{border_score_point_1000:,d} points" if border_score_point_1000 else "Unknown",
-            inline=True,
-        )
-        embed.add_field(
-            name="Top 5000",
-            value=f"{border_score_point_5000:,d} points" if border_score_point_5000 else "Unknown",
-            inline=True,
-        )
-        embed.add_field(
-            name="Time Left",
-            value=time_left,
-            inline=False
-        )
-        embed.add_field(
-            name="Current Time",
-            value=idola.datetime_jp_format(current_time),
-            inline=True,
-        )
-        embed.add_field(
-            name="Ending at",
-            value=idola.datetime_jp_format(end_date),
-            inline=True,
-        )
         await ctx.send(embed=embed)
 
     @commands.command()
-    async def creation_border(self, ctx):
-        """Shows the border for Idola Raid Creation"""
-        border_score_point_100 = idola.get_top_100_raid_creation_border()
-        border_score_point_500 = idola.get_top_500_raid_creation_border()
-        border_score_point_1000 = idola.get_top_1000_raid_creation_border()
-        border_score_point_5000 = idola.get_top_5000_raid_creation_border()
-
-        current_time = idola.get_current_time()
-        end_date = idola.get_raid_event_end_date()
-        time_left = idola.datetime_difference(current_time, end_date)
-
+    async def border_pace(self, ctx, kind, rank: int):
+        """Compares a border with previous events at the same point in the event, e.g. border_pace creation 1000"""
+        if rank not in BORDER_RANKS.get(kind, ()):
+            await ctx.send(f"Borders are recorded for: {', '.join(f'{k} {unpack(r)}' for k, r in BORDER_RANKS.items())}")
+            return
+        snapshot = await self.border_poller.latest()
+        period = snapshot.event_periods.get(kind)
+        if not period:
+            await ctx.send("The current event has no known start date")
+            return
+        fraction, current, previous = await self.client.loop.run_in_executor(
+            None,
+            self.border_pace_index.compare,
+            kind,
+            rank,
+            snapshot.event_ids[kind],
+            period,
+            calendar.timegm(snapshot.fetched_at.timetuple()),
+        )
+        msg = [f"Now: {current:,d}" if current else "Now: Unknown"]
+        for event_id, score, final in previous[:5]:
+            at_fraction = f"{score:,d}" if score else "Unknown"
+            msg.append(f"Event {event_id}: {at_fraction} (final {final:,d})")
+        text = "\n".join(msg)
         embed = discord.Embed(
-            title="Idola Raid Creation Border",
-            color=discord.Colour.blue()
-        )
-        embed.set_thumbnail(url="https://raw.githubusercontent.com/iXyk/IdolaBot/master/idola/lib/assets/raid.png")
-        embed.add_field(
-            name="Top 100",
-            value=f"{border_score_point_100:,d} points" if border_score_point_100 else "Unknown",
-            inline=True,
-        )
-        embed.add_field(
-            name="Top 500",
-            value=f"{border_score_point_500:,d} points" if border_score_point_500 else "Unknown",
-            inline=True,
-        )
-        embed.add_field(
-            name="Top 1000",
-            value=f"{border_score_point_1000:,d} points" if border_score_point_1000 else "Unknown",
-            inline=True,
-        )
-        embed.add_field(
-            name="Top 5000",
-            value=f"{border_score_point_5000:,d} points" if border_score_point_5000 else "Unknown",
-            inline=True,
-        )
-        embed.add_field(
-            name="Time Left",
-            value=time_left,
-            inline=False
+            title=f"Idola {kind.capitalize()} Top {rank} Pace at {fraction:.0%} elapsed",
+            description=f"```{text}```",
+            color=discord.Colour.blue(),
         )
-        embed.add_field(
-            name="Current Time",
-            value=idola.datetime_jp_format(current_time),
-            inline=True,
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    async def rank(self, ctx, kind, player, score: int = None):
+        """Finds a player's current rank by name or profile_id, e.g. rank suppression 123456789"""
+        if kind not in BORDER_RANKS:
+            await ctx.send(f"Rankings can be searched for: {', '.join(BORDER_RANKS)}")
+            return
+        deadline = deadline_after(COMMAND_DEADLINE)
+        profile_id = (
+            int(player) if player.isdigit() else await idola.call("get_profile_id_from_name", player, deadline=deadline)
         )
-        embed.add_field(
-            name="Ending at",
-            value=idola.datetime_jp_format(end_date),
-            inline=True,
+        if not profile_id:
+            await ctx.send("Could not find a player by that name in the cache")
+            return
+        snapshot = await self.border_poller.latest()
+        found, api_calls = await self.rank_locator.locate(
+            kind, snapshot.event_ids[kind], int(profile_id), score, deadline
         )
-        await ctx.send(embed=embed)
+        if not found:
+            await ctx.send(
+                f"Could not find {player} in the {kind} ranking after {api_calls} pages, try again with their current score"
+            )
+            return
+        player_rank, player_score = found
+        await ctx.send(f"{player} is rank {player_rank:,d} in {kind} with {player_score:,d} points")
 
     @commands.command()
     async def arena_team(self, ctx, profile_id: int):
         """Shows the latest ranked arena team for a given profile_id"""
-        arena_team = idola.get_arena_team_composition(profile_id)
+        arena_team = await idola.get_arena_team_composition(profile_id, deadline_after(COMMAND_DEADLINE))
         embed = discord.Embed(
             title=f"Team Score: {arena_team['team_score']:,d}",
             description=f"**Idomag**\nLaw: {arena_team['law_idomag']}\nChaos: {arena_team['chaos_idomag']}",
@@ -417,7 +486,7 @@ class IDOLA(commands.Cog):
     @commands.command()
     async def arena_team_name(self, ctx, profile_name):
         """Shows the matching arena_team using their name if the profile_id has already been cached"""
-        arena_team = idola.get_arena_team_composition_from_name(profile_name)
+        arena_team = await idola.get_arena_team_composition_from_name(profile_name, deadline_after(COMMAND_DEADLINE))
         if not arena_team:
             await ctx.send(
                 "Could not find a player by that name in the cache, to update the cache run 'arena_team' using your profile id first"
@@ -467,7 +536,7 @@ class IDOLA(commands.Cog):
     @commands.command()
     async def arena_top_100(self, ctx):
         """Shows the Top 100 Arena players"""
-        players = idola.show_arena_ranking_top_100_players()
+        players = await idola.show_arena_ranking_top_100_players(deadline_after(COMMAND_DEADLINE))
         msg = []
         for profile_id, ranking_information in sorted(players.items(), key=lambda item: item[1]["arena_score_point"],):
             arena_score_rank = ranking_information["arena_score_rank"]
@@ -488,7 +557,7 @@ class IDOLA(commands.Cog):
     @commands.command()
     async def suppression_top_100(self, ctx):
         """Shows the Top 100 Idola Raid Suppression players"""
-        msg = idola.show_raid_suppression_top_100_players()
+        msg = await idola.show_raid_suppression_top_100_players(deadline_after(COMMAND_DEADLINE))
         msg = msg.split("\n")
         for j, chunks in enumerate([msg[i : i + 50] for i in range(0, len(msg), 50)]):
             text = "\n".join(chunks)
@@ -502,7 +571,7 @@ class IDOLA(commands.Cog):
     @commands.command()
     async def creation_top_100(self, ctx):
         """Shows the Top 100 Idola Creation players"""
-        msg = idola.show_raid_creation_top_100_players()
+        msg = await idola.show_raid_creation_top_100_players(deadline_after(COMMAND_DEADLINE))
         msg = msg.split("\n")
         for j, chunks in enumerate([msg[i : i + 50] for i in range(0, len(msg), 50)]):
             text = "\n".join(chunks)
@@ -516,3 +585,7 @@ class IDOLA(commands.Cog):
 
 def setup(client):
     client.add_cog(IDOLA(client))
+    watch_discord_rate_limits()
+    if IDOLA_METRICS_PORT:
+        start_server(port=IDOLA_METRICS_PORT)
+    client.loop.create_task(idola.start())
@@ -1,18 +1,23 @@
 # -*- coding: utf-8 -*-
-import csv
 import datetime
 import hashlib
 import json
 import os
-import pickle
+import time
 import traceback
+import urllib.parse
 from collections import OrderedDict, defaultdict
 
-import pylru
 import pytz
 import requests
+import requests.adapters
 from dotenv import load_dotenv
 
+from lib.id_map import id_map
+from lib.metrics import API_ERRORS, API_REQUEST_SECONDS
+from lib.profiles import profile_store
+from lib.resilience import CircuitBreaker, DeadlineExceeded, ReauthenticationFailed, time_left
+
 
 IDOLA_API_URL = "https://game.idola.jp/api"
 IDOLA_API_INIT = "https://service.idola.jp/api/app/init"
@@ -28,6 +33,15 @@ IDOLA_RAID_EVENT_INFO = IDOLA_API_URL + "/raid/geteventinfo"
 IDOLA_RAID_RANKING = IDOLA_API_URL + "/raid/ranking"
 IDOLA_RAID_RANKING_OFFSET = IDOLA_API_URL + "/raid/offsetranking"
 
+RANKING_PAGE_SIZE = 20
+TOP_100_OFFSETS = (0, 20, 40, 60, 80)
+SESSION_KEYS = ("replace", "retrans_key")
+BORDER_RANKINGS = {
+    "arena": "get_arena_ranking",
+    "suppression": "get_raid_battle_ranking",
+    "creation": "get_raid_creation_ranking",
+}
+
 
 def unpack(s):
     return ",".join(map(str, s))
@@ -56,18 +70,29 @@ def lb_bullet(number):
         return number
 
 
-profile_cache = pylru.lrucache(size=1000)
+def update_profile_cache(name, profile_id):
+    profile_store.update(name, profile_id)
 
 
-def update_profile_cache(name, profile_id):
-    global profile_cache
-    profile_cache[name] = int(profile_id)
+class IdolaAPIError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"API Error: {status_code}")
+        self.status_code = status_code
 
 
 class HTTPClient(object):
-    def __init__(self, user_agent):
+    def __init__(self, user_agent, pool_size=4, timeout=(5, 15)):
         self.USER_AGENT = user_agent
         self.X_UNITY_VER = "2017.4.26f1"
+        # (connect, read) seconds, further capped by the deadline of the call in progress
+        self.timeout = timeout
+        self.deadline = None
+        self.session = requests.Session()
+        # Keep-alive connections to game.idola.jp are reused across calls instead of a new TLS handshake each time
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
 
     def post(self, url, body={}, headers={}):
         if not headers:
@@ -76,25 +101,49 @@ class HTTPClient(object):
                 "User-Agent": self.USER_AGENT,
             }
         json_output = json.dumps(body)
-        response = requests.post(url, headers=headers, data=json_output)
-        if response.status_code != 200:
-            raise Exception(f"API Error: {response.status_code}")
-        return response
+        return self.send("POST", url, headers=headers, data=json_output)
 
     def get(self, url):
         headers = {
             "User-Agent": self.USER_AGENT,
         }
-        response = requests.get(url, headers=headers)
+        return self.send("GET", url, headers=headers)
+
+    def send(self, method, url, **kwargs):
+        endpoint = self.endpoint(url)
+        try:
+            with API_REQUEST_SECONDS.time(endpoint=endpoint):
+                response = self.session.request(method, url, timeout=self.request_timeout(), **kwargs)
+        except Exception as e:
+            API_ERRORS.inc(endpoint=endpoint, reason=type(e).__name__)
+            raise
         if response.status_code != 200:
-            raise Exception(f"API Error: {response.status_code}")
+            API_ERRORS.inc(endpoint=endpoint, reason=response.status_code)
+            raise IdolaAPIError(response.status_code)
         return response
 
+    @staticmethod
+    def endpoint(url):
+        # Labelled by path alone so both hosts and any query string collapse to a handful of series
+        path = urllib.parse.urlsplit(url).path
+        return path[len("/api"):] if path.startswith("/api/") else path
+
+    def request_timeout(self):
+        remaining = time_left(self.deadline)
+        if remaining is None:
+            return self.timeout
+        connect_timeout, read_timeout = self.timeout
+        return (min(connect_timeout, remaining), min(read_timeout, remaining))
+
+    def close(self):
+        self.session.close()
+
 
 class IdolaAPI(object):
-    def __init__(self, user_agent, app_ver, device_id, device_token, token_key, uuid):
-        self.load_profile_cache()
-        self.client = HTTPClient(user_agent)
+    def __init__(
+        self, user_agent, app_ver, device_id, device_token, token_key, uuid, pool_size=4, home_notice_ttl=300, login=True
+    ):
+        self.client = HTTPClient(user_agent, pool_size)
         self.app_ver = app_ver
         self.auth_key = ""
         self.device_id = device_id
@@ -104,40 +153,82 @@ class IdolaAPI(object):
         self.session_key = ""
         self.token_key = token_key
         self.uuid = uuid
-        self.character_map = {}
-
-        self.import_id_map(os.path.join("lib", "idola_map", "Character ID.csv"))
-        self.import_id_map(os.path.join("lib", "idola_map", "Weapon ID.csv"))
-        self.import_id_map(os.path.join("lib", "idola_map", "Soul ID.csv"))
-        self.import_id_map(os.path.join("lib", "idola_map", "Idomag ID.csv"))
-
-        self.start()
-        print("Idola API ready!")
+        self.id_map = id_map
+        self.home_notice = None
+        self.home_notice_time = 0
+        self.home_notice_ttl = home_notice_ttl
+        self.breaker = CircuitBreaker()
+        self.reauth_attempts = 3
+        self.reauth_backoff = 2
+
+        # login=False leaves the profile cache and login chain to the caller, e.g. AsyncIdolaAPI.start
+        if login:
+            self.load_profile_cache()
+            self.start()
+            print("Idola API ready!")
 
     def start(self):
         try:
-            self.api_init()
-            self.pre_login()
-            self.login()
-            self.update_retrans_key()
+            self.login_chain()
+            self.breaker.record_success()
         except Exception as e:
             print(e, traceback.format_exc())
 
-    def import_id_map(self, csv_filepath):
-        # https://github.com/NNSTJP/Idola
-        with open(csv_filepath, newline="") as csvfile:
-            char_csv = csv.reader(csvfile, delimiter=",")
-            for row in char_csv:
-                self.character_map[str(row[0])] = str(row[1])
+    def login_chain(self):
+        self.invalidate_home_notice()
+        self.api_init()
+        self.pre_login()
+        self.login()
+        self.update_retrans_key()
+
+    def set_deadline(self, deadline):
+        self.client.deadline = deadline
+
+    def run(self, method, *args, **kwargs):
+        self.breaker.check()
+        try:
+            result = getattr(self, method)(*args, **kwargs)
+        except (IdolaAPIError, KeyError) as e:
+            # A rejected request or a reply without the session fields means the session has expired
+            if isinstance(e, KeyError) and not (e.args and e.args[0] in SESSION_KEYS):
+                raise
+            print(f"Session error in {method}: {e}")
+            self.reauthenticate()
+            result = getattr(self, method)(*args, **kwargs)
+        # A working session closes a half-open breaker, not only a fresh login
+        self.breaker.record_success()
+        return result
+
+    def reauthenticate(self):
+        # Queued callers on this account wait behind this single login instead of each starting their own
+        delay = self.reauth_backoff
+        for attempt in range(self.reauth_attempts):
+            self.breaker.check()
+            try:
+                self.login_chain()
+                self.breaker.record_success()
+                print("Re-authenticated with the Idola API")
+                return
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if self.client.deadline is not None and self.client.deadline <= time.monotonic():
+                    # Our caller ran out of time, that says nothing about the health of the server
+                    raise DeadlineExceeded("Deadline exceeded while re-authenticating") from e
+                self.breaker.record_failure()
+                print(f"Re-authentication attempt {attempt + 1} failed: {e}")
+                if attempt + 1 < self.reauth_attempts:
+                    remaining = time_left(self.client.deadline)
+                    if remaining is not None and remaining < delay:
+                        raise DeadlineExceeded("Deadline exceeded while re-authenticating")
+                    time.sleep(delay)
+                    delay *= 2
+        raise ReauthenticationFailed(f"Gave up re-authenticating after {self.reauth_attempts} attempts")
 
     def get_name_from_id(self, char_id):
         if not char_id:
             return "-"
-        for c_id in self.character_map:
-            if str(char_id).startswith(c_id):
-                return self.character_map[c_id]
-        print(f"Unknown char_id: {char_id}")
-        return "Unknown"
+        return self.id_map.get_name(char_id)
 
     def update_retrans_key(self):
         response = self.client.post(IDOLA_HOME_NOW)
@@ -219,21 +310,12 @@ class IdolaAPI(object):
         self.retrans_key = json_response["retrans_key"]
 
     def get_latest_arena_event_id(self):
-        body = {
-            "app_ver": self.app_ver,
-            "res_ver": self.res_ver,
-            "auth_key": self.auth_key,
-            "retrans_key": self.retrans_key,
-            "is_tutorial": "false",
-            "readed_character_promotion_id_list": None,
-        }
-        response = self.client.post(IDOLA_HOME_NOTICE, body)
-        json_response = response.json()
-        event_id = json_response["replace"]["ant"]["event_id"]
-        self.retrans_key = json_response["retrans_key"]
-        return event_id
+        home_notice = self.get_home_notice()
+        return home_notice["ant"]["event_id"]
 
-    def get_home_notice(self):
+    def get_home_notice(self, force=False):
+        if not force and self.home_notice_is_fresh():
+            return self.home_notice
         body = {
             "app_ver": self.app_ver,
             "res_ver": self.res_ver,
@@ -246,8 +328,27 @@ class IdolaAPI(object):
         json_response = response.json()
         home_notice = json_response["replace"]
         self.retrans_key = json_response["retrans_key"]
+        self.home_notice = home_notice
+        self.home_notice_time = time.monotonic()
         return home_notice
 
+    def home_notice_is_fresh(self):
+        if not self.home_notice:
+            return False
+        if time.monotonic() - self.home_notice_time > self.home_notice_ttl:
+            return False
+        # An event rolling over changes the event ids, so the notice is stale as soon as either event ends
+        now = time.time()
+        for event in ("ant", "raid"):
+            end_date = self.home_notice.get(event, {}).get("end_date")
+            if end_date and end_date <= now:
+                return False
+        return True
+
+    def invalidate_home_notice(self):
+        self.home_notice = None
+        self.home_notice_time = 0
+
     def get_arena_ranking_offset(self, event_id, offset=0):
         body = {
             "app_ver": self.app_ver,
@@ -284,19 +385,8 @@ class IdolaAPI(object):
         return party_info
 
     def get_latest_raid_event_id(self):
-        body = {
-            "app_ver": self.app_ver,
-            "res_ver": self.res_ver,
-            "auth_key": self.auth_key,
-            "retrans_key": self.retrans_key,
-            "is_tutorial": "false",
-            "readed_character_promotion_id_list": None,
-        }
-        response = self.client.post(IDOLA_HOME_NOTICE, body)
-        json_response = response.json()
-        event_id = json_response["replace"]["raid"]["event_id"]
-        self.retrans_key = json_response["retrans_key"]
-        return event_id
+        home_notice = self.get_home_notice()
+        return home_notice["raid"]["event_id"]
 
     def get_arena_ranking(self, event_id, offset=0):
         body = {
@@ -386,16 +476,14 @@ class IdolaAPI(object):
         return text if len(text) < 20 else text[:18] + ".."
 
     def show_arena_ranking_top_100_players(self, event_id=None):
-        players = defaultdict(dict)
         if not event_id:
             event_id = self.get_latest_arena_event_id()
-        top_100_ranking_information = [
-            self.get_arena_ranking_offset(event_id, 0),
-            self.get_arena_ranking_offset(event_id, 20),
-            self.get_arena_ranking_offset(event_id, 40),
-            self.get_arena_ranking_offset(event_id, 60),
-            self.get_arena_ranking_offset(event_id, 80),
-        ]
+        top_100_ranking_information = [self.get_arena_ranking_offset(event_id, offset) for offset in TOP_100_OFFSETS]
+        return self.merge_arena_ranking_pages(top_100_ranking_information)
+
+    @staticmethod
+    def merge_arena_ranking_pages(top_100_ranking_information):
+        players = defaultdict(dict)
         for ranking_information_intervals in top_100_ranking_information:
             for (profile_id, ranking_information,) in ranking_information_intervals.items():
                 update_profile_cache(ranking_information["name"], profile_id)
@@ -405,48 +493,23 @@ class IdolaAPI(object):
         return players
 
     def show_raid_suppression_top_100_players(self, event_id=None):
-        msg = []
         if not event_id:
             event_id = self.get_latest_raid_event_id()
-        top_100_ranking_information = [
-            self.get_raid_battle_ranking(event_id, 0),
-            self.get_raid_battle_ranking(event_id, 20),
-            self.get_raid_battle_ranking(event_id, 40),
-            self.get_raid_battle_ranking(event_id, 60),
-            self.get_raid_battle_ranking(event_id, 80),
-        ]
-
-        prev_profile_id = None
-        for ranking_information_intervals in top_100_ranking_information:
-            for ranking_information in sorted(ranking_information_intervals, key=lambda item: item["score_rank"]):
-                name = ranking_information["friend_profile"]["name"]
-                profile_id = ranking_information["friend_profile"]["profile_id"]
-                update_profile_cache(name, profile_id)
-                if profile_id == prev_profile_id:
-                    continue
-                prev_profile_id = ranking_information["friend_profile"]["profile_id"]
-                raid_score_rank = ranking_information["score_rank"]
-                raid_score_point = ranking_information["score_point"]
-                if raid_score_rank > 100:
-                    break
-                msg.append(f"{raid_score_rank}: {raid_score_point:,d} - {name}({profile_id})")
-        return "\n".join(msg)
+        top_100_ranking_information = [self.get_raid_battle_ranking(event_id, offset) for offset in TOP_100_OFFSETS]
+        return self.format_raid_ranking_pages(top_100_ranking_information)
 
     def show_raid_creation_top_100_players(self, event_id=None):
-        msg = []
         if not event_id:
             event_id = self.get_latest_raid_event_id()
-        top_100_ranking_information = [
-            self.get_raid_creation_ranking(event_id, 0),
-            self.get_raid_creation_ranking(event_id, 20),
-            self.get_raid_creation_ranking(event_id, 40),
-            self.get_raid_creation_ranking(event_id, 60),
-            self.get_raid_creation_ranking(event_id, 80),
-        ]
+        top_100_ranking_information = [self.get_raid_creation_ranking(event_id, offset) for offset in TOP_100_OFFSETS]
+        return self.format_raid_ranking_pages(top_100_ranking_information)
 
+    @staticmethod
+    def format_raid_ranking_pages(top_100_ranking_information):
+        msg = []
         prev_profile_id = None
         for ranking_information_intervals in top_100_ranking_information:
-            for ranking_information in sorted(ranking_information_intervals, key=lambda item: item["score_rank"],):
+            for ranking_information in sorted(ranking_information_intervals, key=lambda item: item["score_rank"]):
                 name = ranking_information["friend_profile"]["name"]
                 profile_id = ranking_information["friend_profile"]["profile_id"]
                 update_profile_cache(name, profile_id)
@@ -460,152 +523,79 @@ class IdolaAPI(object):
                 msg.append(f"{raid_score_rank}: {raid_score_point:,d} - {name}({profile_id})")
         return "\n".join(msg)
 
+    def get_borders(self, kind, ranks, event_id=None):
+        if not event_id:
+            event_id = self.get_latest_arena_event_id() if kind == "arena" else self.get_latest_raid_event_id()
+        get_ranking = getattr(self, BORDER_RANKINGS[kind])
+        borders = OrderedDict()
+        for offset, page_ranks in self.plan_border_pages(ranks):
+            ranking_information = get_ranking(event_id, offset)
+            for rank in page_ranks:
+                # An empty page means nobody has reached that rank yet
+                borders[rank] = self.pick_border(ranking_information, rank)
+        return borders
+
+    @staticmethod
+    def plan_border_pages(ranks):
+        # A page fetched at offset N covers ranks N+1 to N+20, so nearby ranks share one request
+        pages = []
+        for rank in sorted(set(ranks)):
+            if pages and pages[-1][0] < rank <= pages[-1][0] + RANKING_PAGE_SIZE:
+                pages[-1][1].append(rank)
+            else:
+                pages.append((rank - 1, [rank]))
+        return pages
+
+    @staticmethod
+    def pick_border(ranking_information, rank):
+        border = None
+        top_score = None
+        for player_information in ranking_information:
+            score_point = player_information["score_point"]
+            if top_score is None or score_point > top_score:
+                top_score = score_point
+            if player_information["score_rank"] <= rank and (border is None or score_point < border):
+                border = score_point
+        return border if border is not None else top_score
+
     def get_top_100_arena_border(self, event_id=None):
-        try:
-            if not event_id:
-                event_id = self.get_latest_arena_event_id()
-            ranking_information = self.get_arena_ranking(event_id, 99)
-            sorted_ranking_information = sorted(
-                [player_information["score_point"] for player_information in ranking_information], reverse=True
-            )
-            return sorted_ranking_information[0]
-        except IndexError as e:
-            print(e, traceback.format_exc())
-            return None
+        return self.get_borders("arena", [100], event_id)[100]
 
     def get_top_500_arena_border(self, event_id=None):
-        try:
-            if not event_id:
-                event_id = self.get_latest_arena_event_id()
-            ranking_information = self.get_arena_ranking(event_id, 499)
-            sorted_ranking_information = sorted(
-                [player_information["score_point"] for player_information in ranking_information], reverse=True
-            )
-            return sorted_ranking_information[0]
-        except IndexError as e:
-            print(e, traceback.format_exc())
-            return None
+        return self.get_borders("arena", [500], event_id)[500]
 
     def get_top_1000_arena_border(self, event_id=None):
-        try:
-            if not event_id:
-                event_id = self.get_latest_arena_event_id()
-            ranking_information = self.get_arena_ranking(event_id, 999)
-            sorted_ranking_information = sorted(
-                [player_information["score_point"] for player_information in ranking_information], reverse=True
-            )
-            return sorted_ranking_information[0]
-        except IndexError as e:
-            print(e, traceback.format_exc())
-            return None
+        return self.get_borders("arena", [1000], event_id)[1000]
 
     def get_top_100_raid_suppression_border(self, event_id=None):
-        try:
-            if not event_id:
-                event_id = self.get_latest_raid_event_id()
-            ranking_information = self.get_raid_battle_ranking(event_id, 99)
-            sorted_ranking_information = sorted(
-                [player_information["score_point"] for player_information in ranking_information], reverse=True
-            )
-            return sorted_ranking_information[0]
-        except IndexError as e:
-            print(e, traceback.format_exc())
-            return None
+        return self.get_borders("suppression", [100], event_id)[100]
 
     def get_top_500_raid_suppression_border(self, event_id=None):
-        try:
-            if not event_id:
-                event_id = self.get_latest_raid_event_id()
-            ranking_information = self.get_raid_battle_ranking(event_id, 499)
-            sorted_ranking_information = sorted(
-                [player_information["score_point"] for player_information in ranking_information], reverse=True
-            )
-            return sorted_ranking_information[0]
-        except IndexError as e:
-            print(e, traceback.format_exc())
-            return None
+        return self.get_borders("suppression", [500], event_id)[500]
 
     def get_top_1000_raid_suppression_border(self, event_id=None):
-        try:
-            if not event_id:
-                event_id = self.get_latest_raid_event_id()
-            ranking_information = self.get_raid_battle_ranking(event_id, 999)
-            sorted_ranking_information = sorted(
-                [player_information["score_point"] for player_information in ranking_information], reverse=True
-            )
-            return sorted_ranking_information[0]
-        except IndexError as e:
-            print(e, traceback.format_exc())
-            return None
+        return self.get_borders("suppression", [1000], event_id)[1000]
 
     def get_top_5000_raid_suppression_border(self, event_id=None):
-        try:
-            if not event_id:
-                event_id = self.get_latest_raid_event_id()
-            ranking_information = self.get_raid_battle_ranking(event_id, 4999)
-            sorted_ranking_information = sorted(
-                [player_information["score_point"] for player_information in ranking_information], reverse=True
-            )
-            return sorted_ranking_information[0]
-        except IndexError as e:
-            print(e, traceback.format_exc())
-            return None
+        return self.get_borders("suppression", [5000], event_id)[5000]
 
     def get_top_100_raid_creation_border(self, event_id=None):
-        try:
-            event_id = self.get_latest_raid_event_id()
-            ranking_information = self.get_raid_creation_ranking(event_id, 99)
-            sorted_ranking_information = sorted(
-                [player_information["score_point"] for player_information in ranking_information], reverse=True
-            )
-            return sorted_ranking_information[0]
-        except IndexError as e:
-            print(e, traceback.format_exc())
-            return None
+        return self.get_borders("creation", [100], event_id)[100]
 
     def get_top_500_raid_creation_border(self, event_id=None):
-        try:
-            event_id = self.get_latest_raid_event_id()
-            ranking_information = self.get_raid_creation_ranking(event_id, 499)
-            sorted_ranking_information = sorted(
-                [player_information["score_point"] for player_information in ranking_information], reverse=True
-            )
-            return sorted_ranking_information[0]
-        except IndexError as e:
-            print(e, traceback.format_exc())
-            return None
+        return self.get_borders("creation", [500], event_id)[500]
 
     def get_top_1000_raid_creation_border(self, event_id=None):
-        try:
-            if not event_id:
-                event_id = self.get_latest_raid_event_id()
-            ranking_information = self.get_raid_creation_ranking(event_id, 999)
-            sorted_ranking_information = sorted(
-                [player_information["score_point"] for player_information in ranking_information], reverse=True
-            )
-            return sorted_ranking_information[0]
-        except IndexError as e:
-            print(e, traceback.format_exc())
-            return None
+        return self.get_borders("creation", [1000], event_id)[1000]
 
     def get_top_5000_raid_creation_border(self, event_id=None):
-        try:
-            if not event_id:
-                event_id = self.get_latest_raid_event_id()
-            ranking_information = self.get_raid_creation_ranking(event_id, 4999)
-            sorted_ranking_information = sorted(
-                [player_information["score_point"] for player_information in ranking_information], reverse=True
-            )
-            return sorted_ranking_information[0]
-        except IndexError as e:
-            print(e, traceback.format_exc())
-            return None
+        return self.get_borders("creation", [5000], event_id)[5000]
 
     def get_image_from_character_id(self, char_id):
         char_image_template = "https://raw.githubusercontent.com/NNSTJP/Idola/master/Character%20Icon/{}.png"
         default_image = "https://i0.wp.com/bumped.org/idola/wp-content/uploads/2019/11/character-rappy-thumb.png"
         s_char_id = str(char_id)
-        if s_char_id not in self.character_map:
+        if s_char_id not in self.id_map:
             return default_image
         image_name = s_char_id[:-2] + "%20" + s_char_id[-2:]
         return char_image_template.format(image_name)
@@ -695,14 +685,13 @@ class IdolaAPI(object):
         }
 
     def get_profile_id_from_name(self, name):
-        if name in profile_cache:
-            return profile_cache.get(name)
+        profile_id = profile_store.find(name)
+        if profile_id is not None:
+            return profile_id
 
-        players = self.show_arena_ranking_top_100_players()
-        for profile_id, ranking_information in players.items():
-            if ranking_information["name"].startswith(name):
-                return profile_id
-        return None
+        # Unknown names may belong to a current top 100 player, which this refreshes into the store
+        self.show_arena_ranking_top_100_players()
+        return profile_store.find(name)
 
     def get_arena_team_composition_from_name(self, name):
         profile_id = self.get_profile_id_from_name(name)
@@ -720,20 +709,22 @@ class IdolaAPI(object):
         arena_end_date = home_notice["ant"]["end_date"]
         return self.epoch_to_datetime(arena_end_date) - datetime.timedelta(hours=5)
 
+    def get_event_period(self, event="raid"):
+        # Epoch seconds from the event start to the same end date the end date helpers report
+        home_notice = self.get_home_notice()
+        start_date = home_notice[event].get("start_date")
+        end_date = home_notice[event]["end_date"] - 5 * 3600
+        return (start_date, end_date) if start_date else None
+
     def save_profile_cache(self):
-        profile_dict = OrderedDict()
-        for k, v in profile_cache.items():
-            profile_dict[k] = v
-        pickle.dump(profile_dict, open("profile_cache.p", "wb"))
+        # The store also flushes on its own in the background and at exit
+        profile_store.flush()
         return True
 
     def load_profile_cache(self):
-        global profile_cache
         try:
-            profile_dict = pickle.load(open("profile_cache.p", "rb"))
-            for k, v in reversed(profile_dict.items()):
-                profile_cache[k] = v
-        except FileNotFoundError as e:
+            profile_store.import_legacy_cache()
+        except Exception as e:
             print(f"Error: Could not load profile_cache - {e}")
             return False
         print("Profile cache loaded")
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import functools
+import traceback
+
+from lib.api import TOP_100_OFFSETS, IdolaAPI
+from lib.cache import FRESH, STALE, TTLCache
+from lib.id_map import id_map
+from lib.metrics import Gauge
+from lib.perf import count_api_call
+from lib.resilience import DeadlineExceeded, time_left
+from lib.scheduler import BACKGROUND, INTERACTIVE, RequestScheduler
+
+
+class AsyncIdolaAPI(object):
+    def __init__(self, apis):
+        self.apis = apis
+        self.scheduler = RequestScheduler(apis)
+        Gauge("idola_scheduler_pending", "Game API requests waiting for a free account", self.scheduler.pending)
+        self.in_flight = {}
+        self.team_cache = TTLCache()
+        # The loop only holds weak references to tasks, so background refreshes are kept alive here
+        self.refreshes = set()
+        self.ready = None
+
+    async def start(self):
+        # Logs every account in while the bot connects to Discord, callers wait on ready instead of the import
+        ready = self.ready_event()
+        loop = asyncio.get_event_loop()
+        try:
+            await asyncio.gather(
+                loop.run_in_executor(None, id_map.load),
+                asyncio.wrap_future(self.scheduler.submit(lambda api: api.load_profile_cache(), BACKGROUND)),
+                self.broadcast("start", priority=BACKGROUND),
+            )
+            print("Idola API ready!")
+        except Exception:
+            print(traceback.format_exc())
+        finally:
+            ready.set()
+
+    def ready_event(self):
+        if self.ready is None:
+            self.ready = asyncio.Event()
+        return self.ready
+
+    async def call(self, method, *args, priority=INTERACTIVE, deadline=None, **kwargs):
+        count_api_call()
+        try:
+            await asyncio.wait_for(self.ready_event().wait(), time_left(deadline))
+            # Runs a blocking IdolaAPI method off the event loop so the gateway heartbeat keeps going
+            # Priority is part of the key so an interactive caller never waits in the background queue
+            key = self.request_key(method, args, kwargs, priority)
+            future, shared_deadline = self.in_flight.get(key, (None, None)) if key else (None, None)
+            if future is not None and not self.outlives(shared_deadline, deadline):
+                # The shared request could be dropped before this caller would give up on it
+                future = None
+            if future is None:
+                func = functools.partial(self.invoke, method, args, kwargs)
+                future = asyncio.wrap_future(self.scheduler.submit(func, priority, deadline=deadline))
+                # Marks the error as seen in case every caller has already given up on this request
+                future.add_done_callback(lambda done: done.cancelled() or done.exception())
+                if key:
+                    # Identical concurrent calls share one request instead of each hitting the game server
+                    self.in_flight[key] = (future, deadline)
+                    future.add_done_callback(functools.partial(self.finish_in_flight, key))
+            # Shielded so one cancelled caller does not cancel the result the others are waiting on
+            return await asyncio.wait_for(asyncio.shield(future), time_left(deadline))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"Deadline exceeded waiting for {method}")
+
+    async def call_background(self, method, *args, **kwargs):
+        return await self.call(method, *args, priority=BACKGROUND, **kwargs)
+
+    async def fan_out(self, method, arg_list, priority=INTERACTIVE, deadline=None):
+        # Independent calls spread across every logged in account instead of queueing behind one session
+        return await asyncio.gather(
+            *[self.call(method, *args, priority=priority, deadline=deadline) for args in arg_list]
+        )
+
+    async def broadcast(self, method, *args, priority=INTERACTIVE, **kwargs):
+        # Session management goes straight to each account, bypassing the re-authentication wrapper
+        func = functools.partial(self.invoke_direct, method, args, kwargs)
+        futures = self.scheduler.broadcast(func, priority)
+        return await asyncio.gather(*[asyncio.wrap_future(future) for future in futures])
+
+    async def show_arena_ranking_top_100_players(self, deadline=None):
+        event_id = await self.call("get_latest_arena_event_id", deadline=deadline)
+        pages = await self.fan_out(
+            "get_arena_ranking_offset", [(event_id, offset) for offset in TOP_100_OFFSETS], deadline=deadline
+        )
+        return IdolaAPI.merge_arena_ranking_pages(pages)
+
+    async def show_raid_suppression_top_100_players(self, deadline=None):
+        event_id = await self.call("get_latest_raid_event_id", deadline=deadline)
+        pages = await self.fan_out(
+            "get_raid_battle_ranking", [(event_id, offset) for offset in TOP_100_OFFSETS], deadline=deadline
+        )
+        return IdolaAPI.format_raid_ranking_pages(pages)
+
+    async def show_raid_creation_top_100_players(self, deadline=None):
+        event_id = await self.call("get_latest_raid_event_id", deadline=deadline)
+        pages = await self.fan_out(
+            "get_raid_creation_ranking", [(event_id, offset) for offset in TOP_100_OFFSETS], deadline=deadline
+        )
+        return IdolaAPI.format_raid_ranking_pages(pages)
+
+    async def get_arena_team_composition(self, profile_id, deadline=None):
+        arena_team, state = self.team_cache.get(profile_id)
+        if state == FRESH:
+            return arena_team
+        if state == STALE:
+            # Answer straight away with what we have and refresh it for the next lookup
+            refresh = asyncio.ensure_future(self.refresh_arena_team_composition(profile_id))
+            self.refreshes.add(refresh)
+            refresh.add_done_callback(self.refreshes.discard)
+            return arena_team
+        arena_team = await self.call("get_arena_team_composition", profile_id, deadline=deadline)
+        self.team_cache.put(profile_id, arena_team)
+        return arena_team
+
+    async def refresh_arena_team_composition(self, profile_id):
+        try:
+            arena_team = await self.call_background("get_arena_team_composition", profile_id)
+            self.team_cache.put(profile_id, arena_team)
+        except Exception:
+            print(traceback.format_exc())
+
+    async def get_arena_team_composition_from_name(self, name, deadline=None):
+        profile_id = await self.call("get_profile_id_from_name", name, deadline=deadline)
+        if not profile_id:
+            return None
+        return await self.get_arena_team_composition(int(profile_id), deadline)
+
+    @staticmethod
+    def request_key(method, args, kwargs, priority=INTERACTIVE):
+        key = (method, args, tuple(sorted(kwargs.items())), priority)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    @staticmethod
+    def outlives(shared_deadline, deadline):
+        if shared_deadline is None:
+            return True
+        return deadline is not None and shared_deadline >= deadline
+
+    def finish_in_flight(self, key, future):
+        # A newer request with a later deadline may have taken over the key in the meantime
+        if self.in_flight.get(key, (None, None))[0] is future:
+            del self.in_flight[key]
+
+    @staticmethod
+    def invoke(method, args, kwargs, api):
+        return api.run(method, *args, **kwargs)
+
+    @staticmethod
+    def invoke_direct(method, args, kwargs, api):
+        return getattr(api, method)(*args, **kwargs)
+
+    def shutdown(self):
+        self.scheduler.shutdown()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import functools
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+
+from lib.api import BORDER_RANKINGS, IdolaAPI
+
+
+BORDER_RANKS = OrderedDict(
+    [
+        ("arena", (100, 500, 1000)),
+        ("suppression", (100, 500, 1000, 5000)),
+        ("creation", (100, 500, 1000, 5000)),
+    ]
+)
+
+
+class BorderSnapshot(namedtuple("BorderSnapshot", ["borders", "event_ids", "event_periods", "end_date", "fetched_at"])):
+    __slots__ = ()
+
+    def get(self, kind, rank):
+        return self.borders.get((kind, rank))
+
+    def ranks(self, kind):
+        return [(rank, self.get(kind, rank)) for rank in BORDER_RANKS[kind]]
+
+
+class BorderPoller(object):
+    def __init__(self, idola):
+        self.idola = idola
+        self.snapshot = None
+        self.lock = asyncio.Lock()
+
+    async def poll(self, deadline=None):
+        # If the deadline passes the previous snapshot is kept and served as the last good one
+        async with self.lock:
+            return await self.fetch(deadline)
+
+    async def latest(self):
+        # Consumers only trigger a fetch when nothing has been polled yet
+        if self.snapshot is None:
+            async with self.lock:
+                if self.snapshot is None:
+                    return await self.fetch()
+        return self.snapshot
+
+    async def fetch(self, deadline=None):
+        call = functools.partial(self.idola.call_background, deadline=deadline)
+        arena_event_id, raid_event_id, arena_period, raid_period, end_date = await asyncio.gather(
+            call("get_latest_arena_event_id"),
+            call("get_latest_raid_event_id"),
+            call("get_event_period", "ant"),
+            call("get_event_period", "raid"),
+            call("get_raid_event_end_date"),
+        )
+        event_ids = {"arena": arena_event_id, "suppression": raid_event_id, "creation": raid_event_id}
+        event_periods = {"arena": arena_period, "suppression": raid_period, "creation": raid_period}
+        # One call per ranking page so every page runs on whichever account is free
+        pages = [
+            (kind, offset, page_ranks)
+            for kind, ranks in BORDER_RANKS.items()
+            for offset, page_ranks in IdolaAPI.plan_border_pages(ranks)
+        ]
+        ranking_pages = await asyncio.gather(
+            *[call(BORDER_RANKINGS[kind], event_ids[kind], offset) for kind, offset, _ in pages]
+        )
+        borders = {}
+        for (kind, _, page_ranks), ranking_information in zip(pages, ranking_pages):
+            for rank in page_ranks:
+                borders[(kind, rank)] = IdolaAPI.pick_border(ranking_information, rank)
+        self.snapshot = BorderSnapshot(
+            MappingProxyType(borders),
+            MappingProxyType(event_ids),
+            MappingProxyType(event_periods),
+            end_date,
+            IdolaAPI.get_current_time(),
+        )
+        return self.snapshot
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pylru
+
+
+FRESH = "fresh"
+STALE = "stale"
+
+
+class TTLCache(object):
+    def __init__(self, size=500, ttl=300, max_stale=3600):
+        self.entries = pylru.lrucache(size)
+        self.ttl = ttl
+        # Entries older than ttl are still served for up to max_stale seconds while they are refreshed
+        self.max_stale = max_stale
+
+    def get(self, key):
+        if key not in self.entries:
+            return None, None
+        value, stored_at = self.entries[key]
+        age = time.monotonic() - stored_at
+        if age <= self.ttl:
+            return value, FRESH
+        if age <= self.max_stale:
+            return value, STALE
+        del self.entries[key]
+        return None, None
+
+    def put(self, key, value):
+        self.entries[key] = (value, time.monotonic())
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import csv
+import json
+import os
+
+from lib.api import BORDER_RANKINGS, RANKING_PAGE_SIZE, update_profile_cache
+from lib.profiles import profile_store
+
+
+CRAWL_DIR = "crawls"
+CRAWL_FIELDS = ("rank", "score", "profile_id", "name")
+
+
+class LeaderboardCrawler(object):
+    def __init__(self, idola, kind, event_id, max_rank, output_format="ndjson", directory=CRAWL_DIR):
+        self.idola = idola
+        self.kind = kind
+        self.event_id = event_id
+        self.max_rank = max_rank
+        self.output_format = output_format
+        self.output_path = os.path.join(directory, f"{kind}_{event_id}.{output_format}")
+        # Each output format resumes from its own checkpoint, their byte offsets mean nothing to each other
+        self.checkpoint_path = os.path.join(directory, f"{kind}_{event_id}.{output_format}.checkpoint.json")
+        os.makedirs(directory, exist_ok=True)
+
+    def load_checkpoint(self):
+        fresh = {"output_path": self.output_path, "offset": 0, "size": 0, "entries": 0, "last_profile_ids": []}
+        try:
+            with open(self.checkpoint_path) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except (FileNotFoundError, ValueError):
+            return fresh
+        try:
+            output_size = os.path.getsize(self.output_path)
+        except OSError:
+            output_size = -1
+        # Resuming onto a missing or shorter file would pad it with NULs and lose the rows before the checkpoint
+        if checkpoint.get("output_path") != self.output_path or output_size < checkpoint["size"]:
+            print(f"Discarding checkpoint {self.checkpoint_path}, it does not match {self.output_path}")
+            return fresh
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    async def pages(self, offset):
+        # Pages are fetched one at a time at background priority, so memory stays at a single page
+        while offset < self.max_rank:
+            ranking_list = await self.idola.call_background(BORDER_RANKINGS[self.kind], self.event_id, offset)
+            if not ranking_list:
+                return
+            yield offset, ranking_list
+            offset += RANKING_PAGE_SIZE
+
+    async def crawl(self):
+        checkpoint = self.load_checkpoint()
+        loop = asyncio.get_event_loop()
+        async for offset, ranking_list in self.pages(checkpoint["offset"]):
+            checkpoint = await loop.run_in_executor(None, self.write_page, checkpoint, offset, ranking_list)
+        # Only a crawl that stopped early resumes, running a finished one again starts it over
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+        return checkpoint
+
+    def write_page(self, checkpoint, offset, ranking_list):
+        # Ties can repeat a player across neighbouring pages, only the previous page needs remembering
+        last_profile_ids = set(checkpoint["last_profile_ids"])
+        rows = []
+        for profile in sorted(ranking_list, key=lambda item: item["score_rank"]):
+            profile_id = profile["friend_profile"]["profile_id"]
+            name = profile["friend_profile"]["name"]
+            update_profile_cache(name, profile_id)
+            # Seeds the rank locator, so deep players can be found without knowing their score
+            profile_store.update_rank(self.kind, self.event_id, profile_id, profile["score_point"], profile["score_rank"])
+            if profile_id in last_profile_ids or profile["score_rank"] > self.max_rank:
+                continue
+            rows.append((profile["score_rank"], profile["score_point"], profile_id, name))
+
+        with open(self.output_path, "a+", newline="", encoding="utf-8") as output_file:
+            # Drop anything written after the last checkpoint, a crash there would otherwise duplicate rows
+            output_file.truncate(checkpoint["size"])
+            output_file.seek(checkpoint["size"])
+            if self.output_format == "csv":
+                writer = csv.writer(output_file)
+                if checkpoint["size"] == 0:
+                    writer.writerow(CRAWL_FIELDS)
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    output_file.write(json.dumps(dict(zip(CRAWL_FIELDS, row)), ensure_ascii=False) + "\n")
+            output_file.flush()
+            size = output_file.tell()
+
+        checkpoint = {
+            "output_path": self.output_path,
+            "offset": offset + RANKING_PAGE_SIZE,
+            "size": size,
+            "entries": checkpoint["entries"] + len(rows),
+            "last_profile_ids": [profile["friend_profile"]["profile_id"] for profile in ranking_list],
+        }
+        self.save_checkpoint(checkpoint)
+        return checkpoint
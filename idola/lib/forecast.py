@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import calendar
+import threading
+
+
+class LinearTrend(object):
+    __slots__ = ("origin", "count", "sum_x", "sum_y", "sum_xx", "sum_xy", "last_time", "last_score")
+
+    def __init__(self, origin):
+        # x is measured in hours from the first sample to keep the running sums well conditioned
+        self.origin = origin
+        self.count = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xx = 0.0
+        self.sum_xy = 0.0
+        self.last_time = None
+        self.last_score = None
+
+    def add(self, timestamp, score):
+        if self.last_time is not None and timestamp <= self.last_time:
+            return
+        x = (timestamp - self.origin) / 3600
+        self.count += 1
+        self.sum_x += x
+        self.sum_y += score
+        self.sum_xx += x * x
+        self.sum_xy += x * score
+        self.last_time = timestamp
+        self.last_score = score
+
+    def predict(self, timestamp):
+        denominator = self.count * self.sum_xx - self.sum_x * self.sum_x
+        if self.count < 2 or denominator == 0:
+            return None
+        slope = (self.count * self.sum_xy - self.sum_x * self.sum_y) / denominator
+        intercept = (self.sum_y - slope * self.sum_x) / self.count
+        x = (timestamp - self.origin) / 3600
+        # Borders never go down, so the fit is clamped to the latest observed score
+        return max(int(intercept + slope * x), self.last_score)
+
+
+class BorderForecaster(object):
+    def __init__(self, history):
+        self.history = history
+        self.trends = {}
+        self.lock = threading.Lock()
+
+    def trend(self, event_id, kind, rank):
+        key = (event_id, kind, rank)
+        trend = self.trends.get(key)
+        if trend is None:
+            # Replaying the recorded series happens once per key, every later sample is an O(1) update
+            records = self.history.read(event_id, kind, rank)
+            trend = LinearTrend(records[0][0] if records else None)
+            for timestamp, score in records:
+                trend.add(timestamp, score)
+            self.trends[key] = trend
+        return trend
+
+    def observe(self, snapshot):
+        timestamp = calendar.timegm(snapshot.fetched_at.timetuple())
+        with self.lock:
+            for (kind, rank), score in snapshot.borders.items():
+                event_id = snapshot.event_ids.get(kind)
+                if score is None or event_id is None:
+                    continue
+                trend = self.trend(event_id, kind, rank)
+                if trend.origin is None:
+                    trend.origin = timestamp
+                trend.add(timestamp, score)
+
+    def forecast(self, event_id, kind, rank, end_time):
+        with self.lock:
+            trend = self.trend(event_id, kind, rank)
+            if trend.origin is None or end_time is None:
+                return None
+            return trend.predict(end_time)
+
+    @staticmethod
+    def end_time(snapshot, kind):
+        # Arena and raid run on different schedules, snapshot.end_date is only the raid end
+        period = snapshot.event_periods.get(kind)
+        if period:
+            return period[1]
+        if kind == "arena":
+            return None
+        return calendar.timegm(snapshot.end_date.timetuple())
+
+    def forecast_snapshot(self, snapshot):
+        return {
+            (kind, rank): self.forecast(snapshot.event_ids.get(kind), kind, rank, self.end_time(snapshot, kind))
+            for kind, rank in snapshot.borders
+        }
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import calendar
+import json
+import os
+import struct
+import threading
+
+
+BORDER_HISTORY_DIR = "border_history"
+# Fixed-width (epoch seconds, score) records, appended in time order so ranges can be found with a binary search
+BORDER_RECORD = struct.Struct("<qq")
+
+
+class BorderHistory(object):
+    def __init__(self, directory=BORDER_HISTORY_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.periods = None
+
+    def events_path(self):
+        return os.path.join(self.directory, "events.json")
+
+    def event_periods(self):
+        # "kind:event_id" -> [start, end] epoch seconds for every event that has been recorded
+        with self.lock:
+            if self.periods is None:
+                try:
+                    with open(self.events_path()) as events_file:
+                        self.periods = json.load(events_file)
+                except FileNotFoundError:
+                    self.periods = {}
+            return dict(self.periods)
+
+    def record_event(self, event_id, kind, period):
+        key = f"{kind}:{event_id}"
+        if self.event_periods().get(key) == list(period):
+            return
+        with self.lock:
+            self.periods[key] = list(period)
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self.events_path() + ".tmp"
+            with open(tmp_path, "w") as events_file:
+                json.dump(self.periods, events_file)
+            os.replace(tmp_path, self.events_path())
+
+    def series_path(self, event_id, kind, rank):
+        return os.path.join(self.directory, str(event_id), f"{kind}_{rank}.bin")
+
+    def append(self, event_id, kind, rank, timestamp, score):
+        path = self.series_path(event_id, kind, rank)
+        with self.lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "ab") as series_file:
+                series_file.write(BORDER_RECORD.pack(int(timestamp), int(score)))
+
+    def record(self, snapshot):
+        timestamp = calendar.timegm(snapshot.fetched_at.timetuple())
+        for (kind, rank), score in snapshot.borders.items():
+            event_id = snapshot.event_ids.get(kind)
+            if score is None or event_id is None:
+                continue
+            self.append(event_id, kind, rank, timestamp, score)
+        for kind, event_id in snapshot.event_ids.items():
+            period = snapshot.event_periods.get(kind)
+            if period and event_id is not None:
+                self.record_event(event_id, kind, period)
+
+    def read(self, event_id, kind, rank, start=None, end=None):
+        path = self.series_path(event_id, kind, rank)
+        try:
+            series_file = open(path, "rb")
+        except FileNotFoundError:
+            return []
+        with series_file:
+            count = os.fstat(series_file.fileno()).st_size // BORDER_RECORD.size
+            first = self.bisect(series_file, count, start) if start is not None else 0
+            last = self.bisect(series_file, count, end + 1) if end is not None else count
+            if last <= first:
+                return []
+            series_file.seek(first * BORDER_RECORD.size)
+            data = series_file.read((last - first) * BORDER_RECORD.size)
+        return list(BORDER_RECORD.iter_unpack(data))
+
+    @staticmethod
+    def bisect(series_file, count, timestamp):
+        # Index of the first record at or after timestamp
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            series_file.seek(middle * BORDER_RECORD.size)
+            record_time, _ = BORDER_RECORD.unpack(series_file.read(BORDER_RECORD.size))
+            if record_time < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def latest(self, event_id, kind, rank):
+        path = self.series_path(event_id, kind, rank)
+        try:
+            with open(path, "rb") as series_file:
+                size = os.fstat(series_file.fileno()).st_size
+                if size < BORDER_RECORD.size:
+                    return None
+                series_file.seek((size // BORDER_RECORD.size - 1) * BORDER_RECORD.size)
+                return BORDER_RECORD.unpack(series_file.read(BORDER_RECORD.size))
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import csv
+import marshal
+import os
+import threading
+
+
+LIB_DIR = os.path.dirname(os.path.abspath(__file__))
+# https://github.com/NNSTJP/Idola
+ID_MAP_DIR = os.path.join(LIB_DIR, "idola_map")
+ID_MAP_FILES = ("Character ID.csv", "Weapon ID.csv", "Soul ID.csv", "Idomag ID.csv")
+ID_MAP_CACHE = os.path.join(LIB_DIR, "id_map_cache.bin")
+ID_MAP_CACHE_VERSION = 1
+
+
+class IdMap(object):
+    def __init__(self, map_dir=ID_MAP_DIR, cache_path=ID_MAP_CACHE):
+        self.map_dir = map_dir
+        self.cache_path = cache_path
+        self.character_map = None
+        self.character_index = None
+        self.resolved_names = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        # Loaded on first lookup and shared by every account, so startup never waits on the CSVs
+        if self.character_map is not None:
+            return
+        with self.lock:
+            if self.character_map is not None:
+                return
+            signature = self.source_signature()
+            if not self.load_cache(signature):
+                self.compile()
+                self.save_cache(signature)
+            self.resolved_names = {}
+
+    def source_signature(self):
+        signature = [ID_MAP_CACHE_VERSION]
+        for filename in ID_MAP_FILES:
+            stat = os.stat(os.path.join(self.map_dir, filename))
+            signature.append((filename, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def load_cache(self, signature):
+        try:
+            with open(self.cache_path, "rb") as cache_file:
+                cached_signature, character_map, character_index = marshal.load(cache_file)
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+        if cached_signature != signature:
+            return False
+        self.character_map = character_map
+        self.character_index = character_index
+        return True
+
+    def save_cache(self, signature):
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as cache_file:
+                marshal.dump((signature, self.character_map, self.character_index), cache_file)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Error: Could not save id map cache - {e}")
+
+    def compile(self):
+        character_map = {}
+        character_index = {}
+        for filename in ID_MAP_FILES:
+            with open(os.path.join(self.map_dir, filename), newline="") as csvfile:
+                char_csv = csv.reader(csvfile, delimiter=",")
+                for row in char_csv:
+                    character_map[str(row[0])] = str(row[1])
+                    # Position of each id in the merged map, so prefix lookups keep the first-match order of a linear scan
+                    character_index.setdefault(str(row[0]), len(character_index))
+        self.character_map = character_map
+        self.character_index = character_index
+
+    def __contains__(self, char_id):
+        self.load()
+        return str(char_id) in self.character_map
+
+    def get_name(self, char_id):
+        self.load()
+        s_char_id = str(char_id)
+        if s_char_id in self.resolved_names:
+            return self.resolved_names[s_char_id]
+        matches = [s_char_id[:i] for i in range(1, len(s_char_id) + 1) if s_char_id[:i] in self.character_index]
+        if matches:
+            name = self.character_map[min(matches, key=self.character_index.get)]
+        else:
+            print(f"Unknown char_id: {char_id}")
+            name = "Unknown"
+        self.resolved_names[s_char_id] = name
+        return name
+
+
+id_map = IdMap()
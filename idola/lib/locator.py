@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from lib.api import BORDER_RANKINGS, RANKING_PAGE_SIZE
+from lib.profiles import profile_store
+
+
+# Without any known score there is nothing to bisect on, so only the top of the ladder is walked
+UNSCORED_PAGES = 5
+
+
+class RankLocator(object):
+    def __init__(self, idola):
+        self.idola = idola
+
+    async def locate(self, kind, event_id, profile_id, score=None, deadline=None):
+        pages = {}
+
+        async def fetch(offset):
+            if offset not in pages:
+                ranking_list = await self.idola.call(BORDER_RANKINGS[kind], event_id, offset, deadline=deadline)
+                pages[offset] = [(profile["score_point"], profile["score_rank"], profile["friend_profile"]["profile_id"]) for profile in ranking_list]
+            for player_score, player_rank, player_id in pages[offset]:
+                if player_id == profile_id:
+                    profile_store.update_rank(kind, event_id, profile_id, player_score, player_rank)
+                    return pages[offset], (player_rank, player_score)
+            return pages[offset], None
+
+        # The score and rank from the last time the player was seen, kept across restarts by the profile store
+        loop = asyncio.get_event_loop()
+        hint = await loop.run_in_executor(None, profile_store.get_rank, kind, event_id, profile_id)
+        if score is None and hint:
+            score = hint[0]
+        if score is None:
+            for offset in range(0, UNSCORED_PAGES * RANKING_PAGE_SIZE, RANKING_PAGE_SIZE):
+                page, found = await fetch(offset)
+                if found or not page:
+                    return found, len(pages)
+            return None, len(pages)
+
+        # Gallop away from the last known page (or the top) until the score is bracketed
+        low = (hint[1] - 1) // RANKING_PAGE_SIZE * RANKING_PAGE_SIZE if hint else 0
+        page, found = await fetch(low)
+        if found:
+            return found, len(pages)
+        if not page or max(player[0] for player in page) < score:
+            high = low
+            step = RANKING_PAGE_SIZE
+            while low > 0:
+                low = max(0, high - step)
+                page, found = await fetch(low)
+                if found:
+                    return found, len(pages)
+                if page and min(player[0] for player in page) >= score:
+                    break
+                high = low
+                step *= 2
+        else:
+            high = low
+            step = RANKING_PAGE_SIZE
+            while page and min(player[0] for player in page) > score:
+                low = high
+                high = low + step
+                page, found = await fetch(high)
+                if found:
+                    return found, len(pages)
+                step *= 2
+
+        # Bisect between a page entirely above the score and one at or below it
+        while high - low > RANKING_PAGE_SIZE:
+            middle = (low + high) // 2 // RANKING_PAGE_SIZE * RANKING_PAGE_SIZE
+            page, found = await fetch(middle)
+            if found:
+                return found, len(pages)
+            if page and min(player[0] for player in page) > score:
+                low = middle
+            else:
+                high = middle
+
+        # Scores move between polls, so the pages around the bracket are checked as well
+        for offset in (low, high, high + RANKING_PAGE_SIZE, low - RANKING_PAGE_SIZE):
+            if offset < 0:
+                continue
+            page, found = await fetch(offset)
+            if found:
+                return found, len(pages)
+        return None, len(pages)
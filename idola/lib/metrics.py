@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60)
+
+
+def format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in pairs]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Metric(object):
+    kind = None
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self.values = {}
+        # Observations come from the scheduler threads while the exporter reads from its own
+        self.lock = threading.Lock()
+        registry.register(self)
+
+    def key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = sorted(self.values.items())
+            lines += self.render_samples(items)
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render_samples(self, items):
+        return [f"{self.name}{format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, description, callback):
+        super().__init__(name, description)
+        # Read at scrape time, so there is nothing to keep up to date in between
+        self.callback = callback
+
+    def render_samples(self, items):
+        try:
+            return [f"{self.name} {self.callback()}"]
+        except Exception:
+            return []
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            # [per-bucket counts..., +Inf count, sum], made cumulative only when rendered
+            counts = self.values.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render_samples(self, items):
+        lines = []
+        for key, counts in items:
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                total += count
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, [('le', bound)])} {total}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {counts[-1]}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {total}")
+        return lines
+
+
+class Registry(object):
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        # A reloaded extension registers its metrics again, the newest one replaces the old
+        self.metrics = [existing for existing in self.metrics if existing.name != metric.name] + [metric]
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RateLimitCounter(logging.Handler):
+    # discord.py retries 429s on its own and only logs them, so they are counted from its log
+    def emit(self, record):
+        if record.getMessage().startswith("We are being rate limited"):
+            DISCORD_RATE_LIMITS.inc(source="http")
+
+
+def watch_discord_rate_limits():
+    logger = logging.getLogger("discord.http")
+    if not any(isinstance(handler, RateLimitCounter) for handler in logger.handlers):
+        logger.addHandler(RateLimitCounter())
+
+
+def start_server(host=METRICS_HOST, port=METRICS_PORT):
+    global server
+    # Reloading the extension calls this again, the first server keeps serving the same registry
+    if server is not None:
+        return server
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"Could not serve metrics on {host}:{port}, continuing without them - {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="idola-metrics", daemon=True).start()
+    print(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+
+registry = Registry()
+server = None
+
+API_REQUEST_SECONDS = Histogram(
+    "idola_api_request_seconds", "Time spent on each request to the game API", ("endpoint",)
+)
+API_ERRORS = Counter(
+    "idola_api_errors_total", "Failed requests to the game API by status code or exception", ("endpoint", "reason")
+)
+LOOP_SECONDS = Histogram("idola_loop_seconds", "Time spent in one iteration of a background loop", ("loop",))
+DISCORD_EDITS = Counter("idola_discord_edits_total", "Channel and message edits sent to Discord", ("target",))
+DISCORD_EDIT_SECONDS = Histogram(
+    "idola_discord_edit_seconds", "Time spent on an edit to Discord, including rate limit waits", ("target",)
+)
+DISCORD_RATE_LIMITS = Counter("idola_discord_rate_limits_total", "429 responses from Discord", ("source",))
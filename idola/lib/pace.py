@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import bisect
+import threading
+from array import array
+
+
+class PaceCurve(object):
+    __slots__ = ("fractions", "scores")
+
+    def __init__(self, records, start, end):
+        # Timestamps are recorded in order, so the elapsed fractions come out sorted for bisect
+        self.fractions = array("d", ((timestamp - start) / (end - start) for timestamp, _ in records))
+        self.scores = array("q", (score for _, score in records))
+
+    def at(self, fraction):
+        position = bisect.bisect_right(self.fractions, fraction) - 1
+        return self.scores[position] if position >= 0 else None
+
+    def final(self):
+        return self.scores[-1] if self.scores else None
+
+
+class PaceIndex(object):
+    def __init__(self, history):
+        self.history = history
+        self.curves = {}
+        self.lock = threading.Lock()
+
+    def curve(self, event_id, kind, rank, period):
+        key = (event_id, kind, rank)
+        # Only finished events are cached, their borders can no longer move
+        with self.lock:
+            if key in self.curves:
+                return self.curves[key]
+        curve = PaceCurve(self.history.read(event_id, kind, rank), *period)
+        with self.lock:
+            self.curves[key] = curve
+        return curve
+
+    def compare(self, kind, rank, event_id, period, timestamp):
+        start, end = period
+        fraction = (timestamp - start) / (end - start)
+        latest = self.history.latest(event_id, kind, rank)
+        current = latest[1] if latest else None
+        previous = []
+        for key, past_period in sorted(self.history.event_periods().items(), key=lambda item: item[1][0], reverse=True):
+            past_kind, _, past_event_id = key.partition(":")
+            if past_kind != kind or past_event_id == str(event_id) or past_period[1] > timestamp:
+                continue
+            curve = self.curve(past_event_id, kind, rank, past_period)
+            if curve.final() is None:
+                continue
+            previous.append((past_event_id, curve.at(fraction), curve.final()))
+        return fraction, current, previous
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import contextvars
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+
+PERF_WINDOW = 200
+MAX_CAPTURE_SECONDS = 120
+CAPTURE_LINES = 40
+
+# A one element list shared with every task the invocation spawns, so gathered calls add to the same count
+api_calls = contextvars.ContextVar("api_calls", default=None)
+
+
+def count_api_call():
+    calls = api_calls.get()
+    if calls is not None:
+        calls[0] += 1
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class PerfTracker(object):
+    def __init__(self, window=PERF_WINDOW):
+        self.window = window
+        # name -> deque of (seconds, api calls) for the last window invocations
+        self.samples = {}
+        self.capturing = False
+
+    def begin(self):
+        return api_calls.set([0]), time.perf_counter()
+
+    def end(self, name, token):
+        reset_token, start = token
+        calls = api_calls.get()[0]
+        api_calls.reset(reset_token)
+        self.samples.setdefault(name, deque(maxlen=self.window)).append((time.perf_counter() - start, calls))
+
+    @contextmanager
+    def track(self, name):
+        token = self.begin()
+        try:
+            yield
+        finally:
+            self.end(name, token)
+
+    def report(self):
+        lines = [f"{'name':<32}{'n':>5}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'calls':>7}"]
+        for name, samples in sorted(self.samples.items()):
+            durations = [duration for duration, _ in samples]
+            calls = sum(count for _, count in samples) / len(samples)
+            lines.append(
+                f"{name[:31]:<32}{len(samples):>5}"
+                + "".join(f"{percentile(durations, fraction):>9.3f}" for fraction in (0.5, 0.9, 0.99))
+                + f"{max(durations):>9.3f}{calls:>7.1f}"
+            )
+        return "\n".join(lines)
+
+    async def profile_cpu(self, seconds):
+        # cProfile only sees the thread it is enabled on, which is the event loop and everything it awaits
+        with self.capture():
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.sort_stats("cumulative").print_stats(CAPTURE_LINES)
+        stats.sort_stats("tottime").print_stats(CAPTURE_LINES)
+        return output.getvalue()
+
+    async def profile_memory(self, seconds):
+        with self.capture():
+            already_tracing = tracemalloc.is_tracing()
+            if not already_tracing:
+                tracemalloc.start()
+            try:
+                before = tracemalloc.take_snapshot()
+                await asyncio.sleep(seconds)
+                after = tracemalloc.take_snapshot()
+            finally:
+                if not already_tracing:
+                    tracemalloc.stop()
+        lines = [f"Allocation growth over {seconds}s"]
+        lines += [str(stat) for stat in after.compare_to(before, "lineno")[:CAPTURE_LINES]]
+        lines += ["", "Largest allocations still held"]
+        lines += [str(stat) for stat in after.statistics("lineno")[:CAPTURE_LINES]]
+        return "\n".join(lines)
+
+    @contextmanager
+    def capture(self):
+        if self.capturing:
+            raise RuntimeError("A capture is already running")
+        self.capturing = True
+        try:
+            yield
+        finally:
+            self.capturing = False
+
+
+perf_tracker = PerfTracker()
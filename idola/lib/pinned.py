@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+
+import discord
+
+from lib.metrics import DISCORD_EDIT_SECONDS, DISCORD_EDITS, DISCORD_RATE_LIMITS
+
+
+PINNED_MESSAGE_STATE = "pinned_messages.json"
+
+
+class PinnedMessageManager(object):
+    def __init__(self, client, state_path=PINNED_MESSAGE_STATE):
+        self.client = client
+        self.state_path = state_path
+        self.message_ids = self.load_state()
+        self.messages = {}
+        self.digests = {}
+
+    def load_state(self):
+        try:
+            with open(self.state_path) as state_file:
+                return {int(channel_id): message_id for channel_id, message_id in json.load(state_file).items()}
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as state_file:
+            json.dump(self.message_ids, state_file)
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def digest(embed):
+        return hashlib.sha1(json.dumps(embed.to_dict(), sort_keys=True).encode("utf-8")).hexdigest()
+
+    async def update(self, channel, embed):
+        digest = self.digest(embed)
+        if self.digests.get(channel.id) == digest:
+            return False
+        message = await self.get_message(channel)
+        if message is not None:
+            try:
+                await self.edit(message, embed)
+            except discord.NotFound:
+                # The message was deleted since it was cached, so look for it once more before posting a fresh one
+                self.forget(channel)
+                message = await self.discover(channel)
+                if message is not None:
+                    await self.edit(message, embed)
+        if message is None:
+            # get_message has already searched the pins, so there is nothing to reuse
+            message = await channel.send(embed=embed)
+            await message.pin()
+        self.remember(channel, message)
+        self.digests[channel.id] = digest
+        return True
+
+    async def edit(self, message, embed):
+        DISCORD_EDITS.inc(target="message")
+        try:
+            with DISCORD_EDIT_SECONDS.time(target="message"):
+                await message.edit(embed=embed)
+        except discord.HTTPException as e:
+            if e.status == 429:
+                DISCORD_RATE_LIMITS.inc(source="message")
+            raise
+
+    async def get_message(self, channel):
+        if channel.id in self.messages:
+            return self.messages[channel.id]
+        message_id = self.message_ids.get(channel.id)
+        if message_id is None:
+            message = await self.discover(channel)
+        else:
+            try:
+                message = await channel.fetch_message(message_id)
+            except discord.NotFound:
+                message = await self.discover(channel)
+        if message is not None:
+            self.remember(channel, message)
+        return message
+
+    async def discover(self, channel):
+        for pinned_message in await channel.pins():
+            if pinned_message.author.id == self.client.user.id:
+                print(f"Updating existing pinned message with ID {pinned_message.id}")
+                return pinned_message
+        return None
+
+    def remember(self, channel, message):
+        self.messages[channel.id] = message
+        if self.message_ids.get(channel.id) != message.id:
+            self.message_ids[channel.id] = message.id
+            self.save_state()
+
+    def forget(self, channel):
+        self.messages.pop(channel.id, None)
+        self.message_ids.pop(channel.id, None)
+        self.digests.pop(channel.id, None)
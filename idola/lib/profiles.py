@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import atexit
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import traceback
+
+
+PROFILE_DB = "profiles.db"
+LEGACY_PROFILE_CACHE = "profile_cache.p"
+
+
+class ProfileStore(object):
+    def __init__(self, path=PROFILE_DB, flush_interval=30):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.conn = None
+        # lock only guards the in-memory dicts, so update() on the event loop never waits on the disk
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        # Changed entries waiting for the next background flush, and the ones being written right now
+        self.pending = {}
+        self.flushing = {}
+        # (kind, event_id, profile_id) -> (score, rank, updated_at), the same two stages for rank hints
+        self.pending_ranks = {}
+        self.flushing_ranks = {}
+        self.flusher = None
+        self.stopped = threading.Event()
+
+    def connect(self):
+        # Opened on first use so importing the api never touches the disk
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL appends each flush to a log that SQLite checkpoints back into the database, so writers never rewrite the file
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS profiles ("
+                "name TEXT NOT NULL PRIMARY KEY COLLATE BINARY, "
+                "profile_id INTEGER NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS profiles_profile_id ON profiles (profile_id)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS rank_hints ("
+                "kind TEXT NOT NULL, "
+                "event_id TEXT NOT NULL, "
+                "profile_id INTEGER NOT NULL, "
+                "score INTEGER NOT NULL, "
+                "rank INTEGER NOT NULL, "
+                "updated_at REAL NOT NULL, "
+                "PRIMARY KEY (kind, event_id, profile_id))"
+            )
+            self.conn.commit()
+        return self.conn
+
+    def update(self, name, profile_id):
+        with self.lock:
+            self.pending[name] = (int(profile_id), time.time())
+            if self.flusher is None:
+                self.start_flusher()
+
+    def update_rank(self, kind, event_id, profile_id, score, rank):
+        with self.lock:
+            self.pending_ranks[(kind, str(event_id), int(profile_id))] = (int(score), int(rank), time.time())
+            if self.flusher is None:
+                self.start_flusher()
+
+    def start_flusher(self):
+        self.flusher = threading.Thread(target=self.run_flusher, name="profile-store-flusher", daemon=True)
+        self.flusher.start()
+        atexit.register(self.close)
+
+    def run_flusher(self):
+        while not self.stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                print(traceback.format_exc())
+
+    def flush(self):
+        # db_lock is held throughout so two flushes can never write their batches out of order
+        with self.db_lock:
+            with self.lock:
+                if not self.pending and not self.pending_ranks:
+                    return 0
+                self.flushing, self.pending = self.pending, {}
+                self.flushing_ranks, self.pending_ranks = self.pending_ranks, {}
+            rows = [(name, profile_id, updated_at) for name, (profile_id, updated_at) in self.flushing.items()]
+            rank_rows = [key + entry for key, entry in self.flushing_ranks.items()]
+            try:
+                conn = self.connect()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO profiles (name, profile_id, updated_at) VALUES (?, ?, ?)", rows,
+                    )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO rank_hints (kind, event_id, profile_id, score, rank, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        rank_rows,
+                    )
+            except Exception:
+                with self.lock:
+                    # Entries updated again while the write was failing are newer and win
+                    for name, entry in self.flushing.items():
+                        self.pending.setdefault(name, entry)
+                    for key, entry in self.flushing_ranks.items():
+                        self.pending_ranks.setdefault(key, entry)
+                raise
+            finally:
+                with self.lock:
+                    self.flushing = {}
+                    self.flushing_ranks = {}
+        return len(rows) + len(rank_rows)
+
+    def get(self, name):
+        with self.lock:
+            for entries in (self.pending, self.flushing):
+                if name in entries:
+                    return entries[name][0]
+        with self.db_lock:
+            row = self.connect().execute("SELECT profile_id FROM profiles WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def get_rank(self, kind, event_id, profile_id):
+        key = (kind, str(event_id), int(profile_id))
+        with self.lock:
+            for entries in (self.pending_ranks, self.flushing_ranks):
+                if key in entries:
+                    return entries[key][:2]
+        with self.db_lock:
+            row = (
+                self.connect()
+                .execute("SELECT score, rank FROM rank_hints WHERE kind = ? AND event_id = ? AND profile_id = ?", key)
+                .fetchone()
+            )
+        return tuple(row) if row else None
+
+    def find(self, name):
+        # Exact names win, otherwise the first name starting with it, both served by the primary key b-tree
+        profile_id = self.get(name)
+        if profile_id is not None:
+            return profile_id
+        with self.db_lock:
+            row = (
+                self.connect()
+                .execute(
+                    "SELECT name, profile_id FROM profiles WHERE name >= ? AND name < ? ORDER BY name LIMIT 1",
+                    (name, name + "\U0010ffff"),
+                )
+                .fetchone()
+            )
+        with self.lock:
+            matches = [
+                (pending_name, entry[0])
+                for entries in (self.pending, self.flushing)
+                for pending_name, entry in entries.items()
+                if pending_name.startswith(name)
+            ]
+        if row:
+            matches.append(row)
+        return min(matches)[1] if matches else None
+
+    def __len__(self):
+        self.flush()
+        with self.db_lock:
+            return self.connect().execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+    def import_legacy_cache(self, path=LEGACY_PROFILE_CACHE):
+        if not os.path.exists(path) or len(self):
+            return False
+        with open(path, "rb") as cache_file:
+            profile_dict = pickle.load(cache_file)
+        now = time.time()
+        with self.db_lock:
+            conn = self.connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO profiles (name, profile_id, updated_at) VALUES (?, ?, ?)",
+                    [(name, int(profile_id), now) for name, profile_id in profile_dict.items()],
+                )
+        print(f"Imported {len(profile_dict)} profiles from {path}")
+        return True
+
+    def close(self):
+        self.stopped.set()
+        self.flush()
+        with self.db_lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+profile_store = ProfileStore()
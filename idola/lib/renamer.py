@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+import traceback
+from collections import deque
+
+from lib.metrics import DISCORD_EDIT_SECONDS, DISCORD_EDITS, DISCORD_RATE_LIMITS
+
+
+# Discord allows two name changes per channel every ten minutes, going over stalls the caller on a 429
+RENAME_LIMIT = 2
+RENAME_WINDOW = 600
+
+
+class ChannelRenamer(object):
+    def __init__(self, limit=RENAME_LIMIT, window=RENAME_WINDOW):
+        self.limit = limit
+        self.window = window
+        self.applied = {}
+        self.pending = {}
+        self.edits = {}
+
+    def request(self, channel, name):
+        current = self.applied.get(channel.id, channel.name)
+        if current == name:
+            self.pending.pop(channel.id, None)
+            return
+        # Only the newest value matters, older pending names are simply replaced
+        self.pending[channel.id] = (channel, name)
+
+    def available(self, channel_id, now):
+        edits = self.edits.setdefault(channel_id, deque())
+        while edits and now - edits[0] >= self.window:
+            edits.popleft()
+        # Edits are spaced evenly through the window instead of bursting the whole budget at once
+        if edits and now - edits[-1] < self.window / self.limit:
+            return False
+        return len(edits) < self.limit
+
+    async def flush(self):
+        now = time.monotonic()
+        ready = [
+            (channel, name) for channel_id, (channel, name) in self.pending.items() if self.available(channel_id, now)
+        ]
+        await asyncio.gather(*[self.rename(channel, name, now) for channel, name in ready])
+        return len(ready)
+
+    async def rename(self, channel, name, now):
+        # Counted up front so a failed edit still uses up budget, exactly as Discord counts it
+        self.edits[channel.id].append(now)
+        DISCORD_EDITS.inc(target="channel")
+        try:
+            with DISCORD_EDIT_SECONDS.time(target="channel"):
+                await channel.edit(name=name)
+            self.applied[channel.id] = name
+            if self.pending.get(channel.id, (None, None))[1] == name:
+                del self.pending[channel.id]
+        except Exception as e:
+            if getattr(e, "status", None) == 429:
+                DISCORD_RATE_LIMITS.inc(source="channel")
+            print(traceback.format_exc())
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class ReauthenticationFailed(Exception):
+    pass
+
+
+def deadline_after(seconds):
+    # Deadlines are absolute monotonic times so they mean the same thing on every worker thread
+    return time.monotonic() + seconds
+
+
+def time_left(deadline):
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Deadline exceeded")
+    return remaining
+
+
+class CircuitBreaker(object):
+    def __init__(self, failure_threshold=3, reset_timeout=300):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        # Once reset_timeout has passed a single trial is let through (half-open)
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def check(self):
+        if not self.allow():
+            raise CircuitOpenError("Idola API is unavailable, waiting before logging in again")
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
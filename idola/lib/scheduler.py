@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+from lib.resilience import DeadlineExceeded
+
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class RequestScheduler(object):
+    def __init__(self, apis):
+        # Each worker thread exclusively owns one account's api, so its auth_key/retrans_key chain is never shared
+        self.apis = apis
+        self.jobs = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.workers = [
+            threading.Thread(target=self.run, args=(index, api), name=f"idola-scheduler-{index}", daemon=True)
+            for index, api in enumerate(apis)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, func, priority=INTERACTIVE, worker=None, deadline=None):
+        future = Future()
+        with self.condition:
+            # The counter keeps requests of the same priority in FIFO order
+            self.jobs.append((priority, next(self.counter), worker, func, future, deadline))
+            self.condition.notify_all()
+        return future
+
+    def broadcast(self, func, priority=INTERACTIVE):
+        return [self.submit(func, priority, worker) for worker in range(len(self.workers))]
+
+    def next_job(self, index):
+        with self.condition:
+            while True:
+                eligible = [job for job in self.jobs if job[2] is None or job[2] == index]
+                if eligible:
+                    job = min(eligible, key=lambda job: job[:2])
+                    self.jobs.remove(job)
+                    return job
+                if self.closed:
+                    return None
+                self.condition.wait()
+
+    def run(self, index, api):
+        while True:
+            job = self.next_job(index)
+            if job is None:
+                return
+            _, _, _, func, future, deadline = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            if deadline is not None and deadline <= time.monotonic():
+                # Nobody is waiting for this any more, so it is dropped instead of sent
+                future.set_exception(DeadlineExceeded("Deadline exceeded before the request was sent"))
+                continue
+            api.set_deadline(deadline)
+            try:
+                future.set_result(func(api))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                api.set_deadline(None)
+
+    def pending(self):
+        with self.condition:
+            return len(self.jobs)
+
+    def shutdown(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()